@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark product text cleaning, row-wise apply against the vectorized pipeline
+
+A synthetic catalog shaped like the raw product dataset is cleaned with the
+DataFrame.apply implementations the loaders used to run and with the
+src/cleaning.py functions that replaced them. Both must produce the same
+output; throughput is reported in rows per second.
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, List
+import logging
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.catalog import normalize_products
+from src.cleaning import fill_empty_text, list_text
+from src.rag.embedding_store import build_embedding_texts
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+WORDS = np.array([
+    'guitar', 'string', 'acoustic', 'electric', 'bass', 'drum', 'pedal', 'cable',
+    'microphone', 'stand', 'stainless', 'nickel', 'wound', 'light', 'gauge', 'set',
+    'keyboard', 'sustain', 'violin', 'bow', 'rosin', 'ukulele', 'tuner', 'capo',
+])
+# Descriptions that carry no text in the raw data
+EMPTY_VALUES = np.array(['', 'nan', '[]'])
+
+
+def synthetic_catalog(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A raw-format product catalog with a third of the descriptions empty"""
+    rng = np.random.default_rng(seed)
+
+    def phrases(length: int) -> pd.Series:
+        words = [pd.Series(WORDS[rng.integers(len(WORDS), size=rows)]) for _ in range(length)]
+        return words[0].str.cat(words[1:], sep=' ')
+
+    description = phrases(12)
+    empty = rng.random(rows) < 0.33
+    description[empty] = EMPTY_VALUES[rng.integers(len(EMPTY_VALUES), size=int(empty.sum()))]
+    return pd.DataFrame({
+        'parent_asin': pd.Series(np.arange(rows)).map('B{:09d}'.format),
+        'title': phrases(5),
+        'description': description,
+        'features': phrases(4).str.replace(' ', '|', n=2),
+        'main_category': WORDS[rng.integers(len(WORDS), size=rows)],
+        'average_rating': np.round(rng.uniform(1, 5, size=rows), 1),
+        'price': np.round(rng.uniform(1, 500, size=rows), 2),
+    })
+
+
+def rowwise_fill_description(df: pd.DataFrame) -> pd.Series:
+    """The per-row description fallback the loaders used before"""
+    def fill_description(row):
+        desc = str(row.get('description', ''))
+        if not desc or desc.lower() == 'nan' or desc.strip() == '[]':
+            features = str(row.get('features', ''))
+            if features and features.lower() != 'nan' and features.strip() != '[]':
+                return features
+        return desc
+    return df.apply(fill_description, axis=1)
+
+
+def vectorized_fill_description(df: pd.DataFrame) -> pd.Series:
+    return fill_empty_text(df.copy(), 'description', ['features'])['description']
+
+
+def rowwise_embedding_texts(df: pd.DataFrame) -> List[str]:
+    """The per-row encoder input recipe before build_embedding_texts was vectorized"""
+    return df.apply(lambda x: f"{x['Product_Title']} {x['Description']}", axis=1).tolist()
+
+
+def rowwise_feature_lists(df: pd.DataFrame) -> List[str]:
+    """Feature lists as the row-wise recipe wrote them to CSV"""
+    return df['features'].apply(lambda x: str(str(x).split('|') if pd.notnull(x) else [])).tolist()
+
+
+def vectorized_feature_lists(df: pd.DataFrame) -> List[str]:
+    return list_text(df['features']).tolist()
+
+
+def timed(function: Callable, df: pd.DataFrame):
+    """Run function on df, returning (result, rows per second)"""
+    start = time.perf_counter()
+    result = function(df)
+    return result, len(df) / (time.perf_counter() - start)
+
+
+def same(a, b) -> bool:
+    if isinstance(a, pd.Series):
+        a, b = a.tolist(), b.tolist()
+    return a == b
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic catalog size')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic catalog')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logger.info(f"Generating a synthetic catalog of {args.rows} products...")
+    raw = synthetic_catalog(args.rows, args.seed)
+    processed = raw.rename(columns={'title': 'Product_Title', 'description': 'Description'})
+
+    stages: Dict[str, tuple] = {
+        'fill description': (rowwise_fill_description, vectorized_fill_description, raw),
+        'embedding texts': (rowwise_embedding_texts, build_embedding_texts, processed),
+        'feature lists': (rowwise_feature_lists, vectorized_feature_lists, raw),
+    }
+
+    print(f"{'stage':<20}{'row-wise/s':>14}{'vectorized/s':>14}{'speedup':>10}{'same':>6}")
+    for name, (rowwise, vectorized, df) in stages.items():
+        before, before_rate = timed(rowwise, df)
+        after, after_rate = timed(vectorized, df)
+        print(
+            f"{name:<20}{before_rate:>14,.0f}{after_rate:>14,.0f}"
+            f"{after_rate / before_rate:>9.1f}x{'yes' if same(before, after) else 'NO':>6}"
+        )
+
+    # The whole catalog load path, which no longer has a row-wise version
+    _, rate = timed(lambda df: normalize_products(df.copy()), raw)
+    print(f"{'normalize_products':<20}{'':>14}{rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
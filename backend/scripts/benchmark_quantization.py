@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark quantized product embeddings against exact float32 search
+
+Every quantization mode searches the same query set with two-stage
+scoring (approximate scores on the quantized copy, exact rescoring of the
+top k * rescore rows) and is compared with exact flat search on memory,
+latency and recall@k. Queries are stored product embeddings with noise
+added, so results do not depend on the query encoder.
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import Dict, List
+import logging
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.config import Settings
+from src.rag.embedding_store import open_embedding_store
+from src.rag.vector_index import INDEX_TYPES, QUANTIZATION_MODES, FlatIndex, VectorIndex, build_index
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def synthetic_embeddings(rows: int, dims: int, seed: int = 0) -> np.ndarray:
+    """Unit-length rows drawn around a few hundred topics, like a product catalog"""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(1, rows // 500), dims)).astype(np.float32)
+    embeddings = topics[rng.integers(len(topics), size=rows)]
+    embeddings += 0.5 * rng.standard_normal((rows, dims)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings
+
+
+def benchmark_queries(embeddings: np.ndarray, count: int, noise: float, seed: int = 0) -> np.ndarray:
+    """Random product embeddings with Gaussian noise of the given relative size"""
+    rng = np.random.default_rng(seed + 1)
+    rows = np.sort(rng.choice(len(embeddings), size=min(count, len(embeddings)), replace=False))
+    queries = np.asarray(embeddings[rows], dtype=np.float32)
+    scale = noise * np.linalg.norm(queries, axis=1, keepdims=True) / np.sqrt(queries.shape[1])
+    return queries + scale * rng.standard_normal(queries.shape).astype(np.float32)
+
+
+def run_benchmark(index: VectorIndex, queries: np.ndarray, exact: List[np.ndarray],
+                  k: int) -> Dict[str, float]:
+    """Latency of index.search over the queries and recall@k against the exact results"""
+    latencies = []
+    recalls = []
+    for query, truth in zip(queries, exact):
+        start = time.perf_counter()
+        ids, _ = index.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(np.intersect1d(ids, truth).size / max(1, len(truth)))
+
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        'mean_ms': float(latencies_ms.mean()),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        f'recall@{k}': float(np.mean(recalls))
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Benchmark this many synthetic embeddings instead of the embedding store')
+    parser.add_argument('--dims', type=int, default=384, help='Synthetic embedding dimensions')
+    parser.add_argument('--index', choices=sorted(INDEX_TYPES), default='flat',
+                        help='Vector index searched in every mode')
+    parser.add_argument('--queries', type=int, default=200, help='Benchmark queries')
+    parser.add_argument('--noise', type=float, default=0.5, help='Query noise relative to the row norm')
+    parser.add_argument('-k', type=int, default=10, help='Results per query')
+    parser.add_argument('--rescore', type=int, nargs='+', default=[1, 4, 10],
+                        help='Shortlist sizes, as multiples of k, rescored in float32')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.synthetic:
+        embeddings = synthetic_embeddings(args.synthetic, args.dims)
+    else:
+        store = open_embedding_store(Settings().EMBEDDING_STORE_DIR)
+        if store is None:
+            logger.error("No embedding store found, run preprocess_data.py or pass --synthetic")
+            sys.exit(1)
+        embeddings = store.embeddings
+
+    queries = benchmark_queries(embeddings, args.queries, args.noise)
+    exact_index = FlatIndex(embeddings)
+    exact = [exact_index.search(query, args.k)[0] for query in queries]
+    full_bytes = embeddings.shape[0] * embeddings.shape[1] * 4
+    logger.info(
+        f"Benchmarking {len(queries)} queries over {embeddings.shape[0]:,} x {embeddings.shape[1]} "
+        f"embeddings ({args.index} index, float32 matrix {full_bytes / 1e6:.1f} MB)"
+    )
+
+    index = build_index(args.index, embeddings)
+    print(f"{'mode':<10}{'rescore':>8}{'MB':>10}{'saved':>8}{'mean_ms':>10}{'p95_ms':>10}{f'recall@{args.k}':>11}")
+    for mode in QUANTIZATION_MODES:
+        for rescore in ([1] if mode == "none" else args.rescore):
+            index.quantize(mode, rescore)
+            nbytes = index.quantized.nbytes if index.quantized is not None else full_bytes
+            metrics = run_benchmark(index, queries, exact, args.k)
+            print(
+                f"{mode:<10}{rescore if mode != 'none' else '-':>8}{nbytes / 1e6:>10.1f}"
+                f"{1 - nbytes / full_bytes:>8.0%}{metrics['mean_ms']:>10.3f}{metrics['p95_ms']:>10.3f}"
+                f"{metrics[f'recall@{args.k}']:>11.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark lexical, semantic and hybrid product retrieval
+
+Each retriever runs over a fixed query set and is scored on latency and
+recall@k. A product counts as relevant to a query when its title contains
+one of the query's keywords; the default set mixes keyword queries, which
+favour BM25, with paraphrases, which favour embeddings.
+"""
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+import logging
+
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.config import Settings
+from src.rag.assistant import ECommerceRAG
+from src.rag.hybrid import FUSION_METHODS, HybridRetriever
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# (query, title keywords marking a product as relevant)
+DEFAULT_QUERIES: List[Tuple[str, List[str]]] = [
+    ("guitar strings", ["string"]),
+    ("acoustic guitar strings", ["string"]),
+    ("guitar capo", ["capo"]),
+    ("guitar strap", ["strap"]),
+    ("microphone stand", ["stand"]),
+    ("wireless microphone", ["wireless"]),
+    ("sustain pedal for keyboard", ["sustain", "pedal"]),
+    ("midi keyboard controller", ["midi"]),
+    ("instrument cable", ["cable"]),
+    ("violin strings", ["violin"]),
+    ("something to sing karaoke with", ["microphone", "mic "]),
+    ("keep my guitar in tune", ["tuner"]),
+    ("hold sheet music while playing", ["music stand"]),
+    ("protect my guitar when travelling", ["case", "gig bag"]),
+    ("power my effects pedals", ["power supply", "adapter"]),
+    ("learn to play drums quietly at home", ["drum", "practice pad"]),
+    ("connect a guitar to a computer", ["usb", "interface"]),
+    ("pick for playing guitar", ["pick"]),
+    ("headphones for monitoring", ["headphone"]),
+    ("ukulele for beginners", ["ukulele"]),
+]
+
+
+def load_queries(path: Path) -> List[Tuple[str, List[str]]]:
+    """Read {"query": ..., "keywords": [...]} lines from a JSONL file"""
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                queries.append((item['query'], item['keywords']))
+    return queries
+
+
+def relevant_rows(titles: np.ndarray, keywords: List[str]) -> np.ndarray:
+    """Row positions whose lowercased title contains any keyword"""
+    return np.flatnonzero([
+        any(keyword.lower() in title for keyword in keywords) for title in titles
+    ])
+
+
+def run_benchmark(search: Callable[[str, int], Tuple[np.ndarray, np.ndarray]],
+                  queries: List[Tuple[str, np.ndarray]], k: int, repeats: int) -> Dict[str, float]:
+    """
+    Time a retriever over the query set and measure its recall@k
+
+    Recall is capped at k, so a query with more than k relevant products
+    scores 1.0 when all k results are relevant.
+    """
+    latencies = []
+    recalls = []
+    for query, relevant in queries:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            ids, _ = search(query, k)
+            latencies.append(time.perf_counter() - start)
+        if len(relevant):
+            hits = np.intersect1d(ids, relevant).size
+            recalls.append(hits / min(k, len(relevant)))
+
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        f'recall@{k}': float(np.mean(recalls)) if recalls else float('nan')
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--queries', type=Path, default=None,
+                        help='JSONL query set with "query" and "keywords" fields (default: built-in set)')
+    parser.add_argument('-k', type=int, default=10, help='Results per query')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed runs per query')
+    parser.add_argument('--fusion', choices=FUSION_METHODS, default='rrf', help='Hybrid score fusion')
+    parser.add_argument('--candidates', type=int, default=50,
+                        help='Rows each retriever contributes to hybrid fusion')
+    parser.add_argument('--cached', action='store_true',
+                        help='Reuse query embeddings across runs instead of encoding every time')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    assistant = ECommerceRAG.from_settings(Settings())
+
+    # Uncached by default so semantic latency includes the query encode
+    encode = (
+        assistant.query_cache.encode if args.cached
+        else lambda query: assistant._encode_batch([query])[0]
+    )
+    retriever = HybridRetriever(
+        assistant.hybrid_retriever.lexical_index,
+        assistant.vector_index,
+        encode,
+        fusion=args.fusion,
+        candidates=args.candidates
+    )
+
+    titles = assistant.product_df['Product_Title'].astype(str).str.lower().to_numpy()
+    raw_queries = load_queries(args.queries) if args.queries else DEFAULT_QUERIES
+    queries = [(query, relevant_rows(titles, keywords)) for query, keywords in raw_queries]
+
+    # Warm up the model and indexes before timing
+    for query, _ in queries[:3]:
+        retriever.search(query, args.k)
+
+    retrievers = {
+        'lexical': retriever.lexical_search,
+        'semantic': retriever.semantic_search,
+        f'hybrid ({args.fusion})': retriever.search,
+    }
+    logger.info(
+        f"Benchmarking {len(queries)} queries x {args.repeats} runs over "
+        f"{len(assistant.product_df)} products ({assistant.vector_index.kind} vector index)"
+    )
+
+    results = {name: run_benchmark(search, queries, args.k, args.repeats) for name, search in retrievers.items()}
+    columns = list(next(iter(results.values())).keys())
+    print(f"{'retriever':<16}" + ''.join(f"{column:>12}" for column in columns))
+    for name, metrics in results.items():
+        print(f"{name:<16}" + ''.join(f"{metrics[column]:>12.3f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
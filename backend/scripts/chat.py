@@ -18,10 +18,7 @@ class ChatSession:
     def __init__(self):
         """Initialize chat session"""
         settings = Settings()
-        self.assistant = ECommerceRAG(
-            product_dataset_path=settings.PRODUCT_DATA_PATH,
-            order_dataset_path=settings.ORDER_DATA_PATH
-        )
+        self.assistant = ECommerceRAG.from_settings(settings)
         self.customer_id = None
 
     def process_input(self, user_input: str) -> str:
@@ -3,15 +3,48 @@
 Data preprocessing script for E-commerce RAG Chatbot
 """
 
+import sys
+import time
+import argparse
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
-import pickle
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
 import logging
 from datetime import datetime
 
+# Add the project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.rag.embedding_store import (
+    EmbeddingStoreWriter,
+    StoredEmbeddings,
+    build_embedding_texts,
+    compute_fingerprint,
+    content_hashes,
+    file_digest,
+    open_embedding_store,
+    product_row_ids,
+    update_embeddings,
+    write_embedding_store,
+)
+from src.rag.parallel import ParallelEncoder
+from src.rag.vector_index import INDEX_TYPES, build_index, save_index, update_index
+from src.rag.lexical import LEXICAL_FIELDS, BM25Index, build_lexical_texts
+from src.rag.neighbors import NeighborTable
+from src.cleaning import fill_empty_text, fill_missing_text, list_text
+from src.storage import (
+    HAS_PYARROW,
+    ORDER_DTYPES,
+    PRODUCT_DTYPES,
+    TableAppender,
+    preferred_path,
+    read_table,
+    write_table,
+)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -34,14 +67,17 @@ def load_datasets(product_path: Path, order_path: Path) -> Tuple[pd.DataFrame, p
     logger.info(f"Order CSV columns: {order_df.columns.tolist()}")
     
     # Basic cleaning
-    product_df.fillna('', inplace=True)
-    order_df.fillna('', inplace=True)
+    fill_missing_text(product_df)
+    fill_missing_text(order_df)
     
     return product_df, order_df
 
-def preprocess_product_data(df: pd.DataFrame) -> pd.DataFrame:
+def preprocess_product_data(df: pd.DataFrame, start_id: int = 1) -> pd.DataFrame:
     """
     Preprocess product dataset
+
+    start_id numbers the first row when IDs are generated, so chunks of
+    one dataset get consecutive IDs.
     """
     logger.info("Preprocessing product data...")
     
@@ -66,21 +102,13 @@ def preprocess_product_data(df: pd.DataFrame) -> pd.DataFrame:
     
     # Create a unique product ID if not present
     if 'Product_ID' not in df.columns:
-        df['Product_ID'] = range(1, len(df) + 1)
+        df['Product_ID'] = range(start_id, start_id + len(df))
     
     # Fill empty description with features
-    def fill_description(row):
-        desc = str(row.get('description', ''))
-        if not desc or desc.lower() == 'nan' or desc.strip() == '[]':
-            features = str(row.get('features', ''))
-            if features and features.lower() != 'nan' and features.strip() != '[]':
-                return features
-        return desc
-    
-    df['description'] = df.apply(fill_description, axis=1)
+    fill_empty_text(df, 'description', ['features'])
 
     # Extract features as a list
-    df['feature_list'] = df['features'].apply(lambda x: str(x).split('|') if pd.notnull(x) else [])
+    df['feature_list'] = list_text(df['features'])
     
     # Rename columns to match expected schema
     df = df.rename(columns={
@@ -105,9 +133,12 @@ def preprocess_product_data(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
-def preprocess_order_data(df: pd.DataFrame) -> pd.DataFrame:
+def preprocess_order_data(df: pd.DataFrame, start_id: int = 1) -> pd.DataFrame:
     """
     Preprocess order dataset
+
+    start_id numbers the first row when IDs are generated, so chunks of
+    one dataset get consecutive IDs.
     """
     logger.info("Preprocessing order data...")
     
@@ -125,7 +156,7 @@ def preprocess_order_data(df: pd.DataFrame) -> pd.DataFrame:
     
     # Create a unique order ID if not present
     if 'Order_ID' not in df.columns:
-        df['Order_ID'] = range(1, len(df) + 1)
+        df['Order_ID'] = range(start_id, start_id + len(df))
     
     # Standardize categorical fields
     df['Order_Priority'] = df['Order_Priority'].str.strip().str.title()
@@ -151,63 +182,431 @@ def preprocess_order_data(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
-def create_embeddings(df: pd.DataFrame, model_name: str = "all-MiniLM-L6-v2") -> np.ndarray:
+def create_encoder(model_name: str, workers: int = 0, batch_tokens: int = 8192) -> ParallelEncoder:
     """
-    Create embeddings for product descriptions
+    Encoder for product texts, spread over `workers` processes (0 for one per CPU core)
     """
-    logger.info(f"Creating embeddings using {model_name}...")
-    
-    model = SentenceTransformer(model_name)
-    embeddings = model.encode(
-        df['combined_text'].tolist(),
-        show_progress_bar=True,
-        batch_size=32
+    return ParallelEncoder(
+        model_name, workers=workers or None, batch_tokens=batch_tokens, load_model=SentenceTransformer
     )
-    
-    return embeddings
+
+def create_embeddings(
+    df: pd.DataFrame,
+    model_name: str = "all-MiniLM-L6-v2",
+    previous: Optional[StoredEmbeddings] = None,
+    workers: int = 0,
+    batch_tokens: int = 8192
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Create embeddings for product descriptions
+
+    Uses the same text recipe as ECommerceRAG so the stored matrix can be
+    loaded at startup instead of re-encoding the catalog. Given a previous
+    store version, only products whose content hash is not in it are
+    encoded and the model is not loaded if there are none. Texts are
+    encoded by a ParallelEncoder and come back in catalog order.
+
+    Returns the embeddings, their content hashes and, per row, the
+    previous row it was copied from or -1.
+    """
+    texts = build_embedding_texts(df)
+    hashes = content_hashes(texts, model_name)
+
+    with create_encoder(model_name, workers, batch_tokens) as encoder:
+        def encode(batch):
+            logger.info(f"Creating embeddings for {len(batch)} products using {model_name}...")
+            return encoder.encode(batch)
+
+        embeddings, previous_rows = update_embeddings(texts, hashes, previous, encode)
+    if previous is not None:
+        encoded = int((previous_rows < 0).sum())
+        dropped = len(previous) if previous.hashes is None else int(
+            (~np.isin(np.asarray(previous.hashes), hashes)).sum()
+        )
+        logger.info(
+            f"Encoded {encoded} new or changed products, reused {len(previous_rows) - encoded}, "
+            f"dropped {dropped} stored rows"
+        )
+    return embeddings, hashes, previous_rows
 
 def save_processed_data(
     product_df: pd.DataFrame,
     order_df: pd.DataFrame,
     embeddings: np.ndarray,
-    output_dir: Path
-):
+    output_dir: Path,
+    model_name: str = "all-MiniLM-L6-v2",
+    embedding_dtype: str = "float32",
+    export_csv: bool = False,
+    hashes: Optional[np.ndarray] = None
+) -> str:
     """
     Save processed datasets and embeddings
+
+    Datasets are written as Parquet with explicit column types when pyarrow
+    is installed, and as CSV if requested or if it is not.
+
+    Returns the fingerprint the embeddings were stored under.
     """
     logger.info("Saving processed data...")
     
     # Create output directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Save processed CSVs
-    product_df.to_csv(output_dir / 'processed_products.csv', index=False)
-    order_df.to_csv(output_dir / 'processed_orders.csv', index=False)
-    
-    # Save embeddings
-    with open(output_dir / 'product_embeddings.pkl', 'wb') as f:
-        pickle.dump(embeddings, f)
+    # Save processed datasets
+    if HAS_PYARROW:
+        write_table(product_df, output_dir / 'processed_products.parquet', PRODUCT_DTYPES)
+        write_table(order_df, output_dir / 'processed_orders.parquet', ORDER_DTYPES)
+    else:
+        logger.warning("pyarrow is not installed, saving processed data as CSV only")
+    if export_csv or not HAS_PYARROW:
+        write_table(product_df, output_dir / 'processed_products.csv')
+        write_table(order_df, output_dir / 'processed_orders.csv')
+    
+    # Save embeddings, fingerprinted against the product file the API will load
+    product_path = preferred_path(output_dir / 'processed_products.csv')
+    fingerprint = compute_fingerprint(product_path, model_name)
+    store_path = write_embedding_store(
+        output_dir / 'embeddings',
+        embeddings,
+        product_row_ids(product_df),
+        fingerprint,
+        model_name,
+        dtype=embedding_dtype,
+        hashes=hashes
+    )
+    logger.info(f"Saved embeddings to {store_path}")
     
     # Save preprocessing info
+    save_preprocessing_info(
+        output_dir, len(product_df), len(order_df), embeddings.shape,
+        product_df.columns.tolist(), order_df.columns.tolist()
+    )
+    
+    logger.info(f"Saved {len(product_df)} products and {len(order_df)} orders")
+    return fingerprint
+
+def save_preprocessing_info(
+    output_dir: Path,
+    product_count: int,
+    order_count: int,
+    embedding_shape: Tuple[int, ...],
+    product_columns: List[str],
+    order_columns: List[str]
+):
+    """
+    Record what a preprocessing run produced
+    """
     info = {
         'timestamp': datetime.now().isoformat(),
-        'product_count': len(product_df),
-        'order_count': len(order_df),
-        'embedding_shape': embeddings.shape,
-        'product_columns': product_df.columns.tolist(),
-        'order_columns': order_df.columns.tolist()
+        'product_count': product_count,
+        'order_count': order_count,
+        'embedding_shape': tuple(embedding_shape),
+        'product_columns': product_columns,
+        'order_columns': order_columns
     }
     
     with open(output_dir / 'preprocessing_info.txt', 'w') as f:
         for key, value in info.items():
             f.write(f"{key}: {value}\n")
-    
-    logger.info(f"Saved {len(product_df)} products and {len(order_df)} orders")
+
+class StageTimer:
+    """
+    Seconds and rows accumulated per pipeline stage, for throughput reports
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.rows: Dict[str, int] = {}
+
+    def record(self, stage: str, seconds: float, rows: int):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.rows[stage] = self.rows.get(stage, 0) + rows
+
+    def report(self):
+        """Log rows per second for every stage"""
+        for stage, seconds in self.seconds.items():
+            rate = self.rows[stage] / seconds if seconds > 0 else float('inf')
+            logger.info(f"{stage:<16} {self.rows[stage]:>12,} rows {seconds:>9.2f}s {rate:>12,.0f} rows/s")
+
+def stream_products(
+    product_path: Path,
+    output_dir: Path,
+    chunk_size: int,
+    timer: StageTimer,
+    encoder: ParallelEncoder,
+    model_name: str = "all-MiniLM-L6-v2",
+    previous: Optional[StoredEmbeddings] = None,
+    export_csv: bool = False
+) -> Tuple[str, int, np.ndarray, List[str]]:
+    """
+    Preprocess and embed the product dataset one chunk at a time
+
+    Each chunk is read, cleaned, encoded and appended to the processed
+    product file and a new embedding store version, so memory is bounded
+    by the chunk size. Given a previous store version, only rows whose
+    content hash is not in it are encoded. The encoder's worker pool is
+    shared by all chunks and only started once a chunk needs encoding.
+
+    Returns the fingerprint the embeddings were stored under, the product
+    count, the previous row of each product (-1 if encoded) and the
+    processed columns.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tables = [TableAppender(
+        output_dir / ('processed_products.parquet' if HAS_PYARROW else 'processed_products.csv'),
+        PRODUCT_DTYPES
+    )]
+    if export_csv and HAS_PYARROW:
+        tables.append(TableAppender(output_dir / 'processed_products.csv'))
+    writer = EmbeddingStoreWriter(output_dir / 'embeddings', model_name)
+
+    rows = 0
+    previous_rows = []
+    columns: List[str] = []
+    try:
+        reader = iter(pd.read_csv(product_path, chunksize=chunk_size))
+        while True:
+            start = time.perf_counter()
+            chunk = next(reader, None)
+            if chunk is None:
+                break
+            fill_missing_text(chunk)
+            timer.record('read products', time.perf_counter() - start, len(chunk))
+
+            start = time.perf_counter()
+            chunk = preprocess_product_data(chunk, start_id=rows + 1)
+            columns = chunk.columns.tolist()
+            texts = build_embedding_texts(chunk)
+            hashes = content_hashes(texts, model_name)
+            timer.record('clean products', time.perf_counter() - start, len(chunk))
+
+            start = time.perf_counter()
+            embeddings, chunk_rows = update_embeddings(texts, hashes, previous, encoder.encode)
+            previous_rows.append(chunk_rows)
+            timer.record('encode', time.perf_counter() - start, int((chunk_rows < 0).sum()))
+
+            start = time.perf_counter()
+            for table in tables:
+                table.append(chunk)
+            writer.append(embeddings, product_row_ids(chunk), hashes)
+            timer.record('write products', time.perf_counter() - start, len(chunk))
+
+            rows += len(chunk)
+            logger.info(f"Processed {rows:,} products")
+
+        for table in tables:
+            table.close()
+        fingerprint = compute_fingerprint(preferred_path(output_dir / 'processed_products.csv'), model_name)
+        store_path = writer.commit(fingerprint)
+        logger.info(f"Saved embeddings to {store_path}")
+    except BaseException:
+        for table in tables:
+            table.abort()
+        writer.abort()
+        raise
+
+    previous_rows = np.concatenate(previous_rows) if previous_rows else np.empty(0, dtype=np.int64)
+    return fingerprint, rows, previous_rows, columns
+
+def stream_orders(
+    order_path: Path,
+    output_dir: Path,
+    chunk_size: int,
+    timer: StageTimer,
+    export_csv: bool = False
+) -> Tuple[int, List[str]]:
+    """
+    Preprocess the order dataset one chunk at a time, appending each chunk
+    to the processed order file
+
+    Returns the order count and the processed columns.
+    """
+    tables = [TableAppender(
+        output_dir / ('processed_orders.parquet' if HAS_PYARROW else 'processed_orders.csv'),
+        ORDER_DTYPES
+    )]
+    if export_csv and HAS_PYARROW:
+        tables.append(TableAppender(output_dir / 'processed_orders.csv'))
+
+    rows = 0
+    columns: List[str] = []
+    try:
+        reader = iter(pd.read_csv(order_path, chunksize=chunk_size))
+        while True:
+            start = time.perf_counter()
+            chunk = next(reader, None)
+            if chunk is None:
+                break
+            fill_missing_text(chunk)
+            timer.record('read orders', time.perf_counter() - start, len(chunk))
+
+            start = time.perf_counter()
+            chunk = preprocess_order_data(chunk, start_id=rows + 1)
+            columns = chunk.columns.tolist()
+            timer.record('clean orders', time.perf_counter() - start, len(chunk))
+
+            start = time.perf_counter()
+            for table in tables:
+                table.append(chunk)
+            timer.record('write orders', time.perf_counter() - start, len(chunk))
+            rows += len(chunk)
+
+        for table in tables:
+            table.close()
+    except BaseException:
+        for table in tables:
+            table.abort()
+        raise
+    return rows, columns
+
+def save_vector_index(
+    embeddings: np.ndarray,
+    fingerprint: str,
+    output_dir: Path,
+    kind: str = "ivf",
+    nlist: Optional[int] = None,
+    previous: Optional[StoredEmbeddings] = None,
+    previous_rows: Optional[np.ndarray] = None
+):
+    """
+    Build the product vector index and save it next to the processed data
+
+    Given the previous store version and the row mapping from
+    create_embeddings, the index built over it is patched instead.
+    """
+    if previous is not None and previous_rows is not None:
+        index = update_index(
+            output_dir / 'product_index.npz',
+            embeddings,
+            fingerprint,
+            previous.embeddings,
+            previous.metadata['fingerprint'],
+            previous_rows
+        )
+        if index is not None and index.kind == kind:
+            logger.info(f"Updated {kind} vector index for the changed products")
+            return
+    logger.info(f"Building {kind} vector index...")
+    params = {'nlist': nlist} if kind == 'ivf' else {}
+    index = build_index(kind, embeddings, **params)
+    save_index(index, output_dir / 'product_index.npz', fingerprint)
+    if kind == 'ivf':
+        logger.info(f"Saved IVF index with {index.nlist} lists")
+
+def save_neighbor_table(embeddings: np.ndarray, fingerprint: str, output_dir: Path, k: int = 50):
+    """
+    Compute each product's nearest neighbours for recommendations and save them
+    """
+    logger.info(f"Computing top-{k} neighbours for {len(embeddings)} products...")
+    table = NeighborTable.build(embeddings, k)
+    table.save(output_dir / 'product_neighbors.npz', fingerprint)
+    logger.info(f"Saved neighbour table ({(table.ids.nbytes + table.scores.nbytes) / 1e6:.1f} MB)")
+
+def save_lexical_index(product_df: pd.DataFrame, output_dir: Path):
+    """
+    Build the BM25 index for product search and save it next to the processed data
+    """
+    logger.info("Building lexical index...")
+    index = BM25Index.build(build_lexical_texts(product_df))
+    index.save(
+        output_dir / 'product_lexical_index.npz',
+        file_digest(preferred_path(output_dir / 'processed_products.csv'))
+    )
+    logger.info(f"Saved lexical index with {len(index.vocab)} terms")
+
+def parse_args():
+    """
+    Parse command line options
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--index', choices=sorted(INDEX_TYPES), default='ivf',
+        help='Vector index type to build for semantic search'
+    )
+    parser.add_argument(
+        '--nlist', type=int, default=None,
+        help='Number of IVF lists (default: sqrt of the product count)'
+    )
+    parser.add_argument(
+        '--neighbors', type=int, default=50,
+        help='Neighbours stored per product for recommendations (0 to skip)'
+    )
+    parser.add_argument(
+        '--csv', action='store_true',
+        help='Also export the processed datasets as CSV'
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=0,
+        help='Stream the raw datasets in chunks of this many rows, for catalogs larger than memory (0 loads them whole)'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=0,
+        help='Encoder worker processes (default: one per CPU core; 1 encodes in this process)'
+    )
+    parser.add_argument(
+        '--batch-tokens', type=int, default=8192,
+        help='Padded tokens per encoder batch; batch sizes shrink for long texts and grow for short ones'
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='Encode only new or changed products, reusing the stored embeddings and vector index'
+    )
+    return parser.parse_args()
+
+def run_streaming(args, product_path: Path, order_path: Path, processed_dir: Path):
+    """
+    Streaming preprocessing pipeline: datasets and embeddings are processed
+    in chunks, then the indexes are built from the memory-mapped store
+    """
+    timer = StageTimer()
+    previous = open_embedding_store(processed_dir / 'embeddings') if args.incremental else None
+    with create_encoder("all-MiniLM-L6-v2", args.workers, args.batch_tokens) as encoder:
+        fingerprint, product_count, previous_rows, product_columns = stream_products(
+            product_path, processed_dir, args.chunk_size, timer, encoder,
+            previous=previous, export_csv=args.csv
+        )
+    if encoder.sentences:
+        logger.info(
+            f"Encoded {encoder.sentences:,} products on {encoder.workers} worker(s): "
+            f"{encoder.throughput:,.0f} sentences/s"
+        )
+    order_count, order_columns = stream_orders(
+        order_path, processed_dir, args.chunk_size, timer, export_csv=args.csv
+    )
+
+    store = open_embedding_store(processed_dir / 'embeddings', fingerprint)
+    save_preprocessing_info(
+        processed_dir, product_count, order_count, store.embeddings.shape,
+        product_columns, order_columns
+    )
+
+    start = time.perf_counter()
+    save_vector_index(
+        store.embeddings, fingerprint, processed_dir, args.index, args.nlist,
+        previous=previous, previous_rows=previous_rows
+    )
+    timer.record('vector index', time.perf_counter() - start, product_count)
+
+    if args.neighbors > 0:
+        start = time.perf_counter()
+        save_neighbor_table(store.embeddings, fingerprint, processed_dir, args.neighbors)
+        timer.record('neighbours', time.perf_counter() - start, product_count)
+
+    # Only the indexed text columns are read back
+    start = time.perf_counter()
+    product_file = preferred_path(processed_dir / 'processed_products.csv')
+    save_lexical_index(read_table(product_file, LEXICAL_FIELDS), processed_dir)
+    timer.record('lexical index', time.perf_counter() - start, product_count)
+
+    timer.report()
+    logger.info(f"Streamed {product_count} products and {order_count} orders")
 
 def main():
     """
     Main preprocessing pipeline
     """
+    args = parse_args()
+
     # Set up paths
     base_dir = Path(__file__).parent.parent
     data_dir = base_dir / 'data'
@@ -222,6 +621,10 @@ def main():
     processed_dir.mkdir(parents=True, exist_ok=True)
     
     try:
+        if args.chunk_size > 0:
+            run_streaming(args, product_path, order_path, processed_dir)
+            return
+
         # Load data
         product_df, order_df = load_datasets(product_path, order_path)
         
@@ -229,11 +632,29 @@ def main():
         product_df = preprocess_product_data(product_df)
         order_df = preprocess_order_data(order_df)
         
-        # Create embeddings
-        embeddings = create_embeddings(product_df)
+        # Create embeddings, reusing unchanged rows in incremental mode
+        previous = open_embedding_store(processed_dir / 'embeddings') if args.incremental else None
+        embeddings, hashes, previous_rows = create_embeddings(
+            product_df, previous=previous, workers=args.workers, batch_tokens=args.batch_tokens
+        )
         
         # Save processed data
-        save_processed_data(product_df, order_df, embeddings, processed_dir)
+        fingerprint = save_processed_data(
+            product_df, order_df, embeddings, processed_dir, export_csv=args.csv, hashes=hashes
+        )
+
+        # Build (or patch) the vector index over the stored embeddings
+        save_vector_index(
+            embeddings, fingerprint, processed_dir, args.index, args.nlist,
+            previous=previous, previous_rows=previous_rows
+        )
+
+        # Precompute similar products for /products/recommendations
+        if args.neighbors > 0:
+            save_neighbor_table(embeddings, fingerprint, processed_dir, args.neighbors)
+
+        # Build the inverted index for /products/search
+        save_lexical_index(product_df, processed_dir)
         
         logger.info("Preprocessing completed successfully!")
         
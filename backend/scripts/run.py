@@ -16,6 +16,7 @@ from pathlib import Path
 import logging
 from dotenv import load_dotenv
 import os
+from src.storage import preferred_path
 
 # Configure logging
 logging.basicConfig(
@@ -47,9 +48,9 @@ def check_data_files():
     # Check for processed data files
     processed_dir = base_dir / 'data' / 'processed'
     processed_files = [
-        processed_dir / 'processed_products.csv',
-        processed_dir / 'processed_orders.csv',
-        processed_dir / 'product_embeddings.pkl'
+        preferred_path(processed_dir / 'processed_products.csv'),
+        preferred_path(processed_dir / 'processed_orders.csv'),
+        processed_dir / 'embeddings' / 'CURRENT'
     ]
     
     # Check if either raw or processed files exist
@@ -101,51 +102,209 @@ def api(host, port, reload, workers):
         logger.error(f"Error starting server: {str(e)}")
         raise
 
+def read_queries(input_file: str):
+    """
+    Stream queries from a JSONL file, one JSON object per line.
+    A legacy JSON array file is also accepted (loaded in full).
+    """
+    import json
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def count_completed_lines(output_file: str) -> int:
+    """
+    Count complete records in an output file, truncating a trailing
+    partial line left by an interrupted run
+    """
+    path = Path(output_file)
+    if not path.exists():
+        return 0
+
+    completed = 0
+    valid_bytes = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            completed += 1
+            valid_bytes += len(line)
+    if valid_bytes != path.stat().st_size:
+        with open(path, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return completed
+
+def chunked(iterable, size: int):
+    """Yield lists of up to size items"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Per-process assistant used by batch workers
+_batch_assistant = None
+
+def _init_batch_worker():
+    """Load the assistant once per worker; embeddings are memory-mapped and shared"""
+    global _batch_assistant
+    from src.rag.assistant import ECommerceRAG
+    from src.config import Settings
+
+    setup_environment()
+    _batch_assistant = ECommerceRAG.from_settings(Settings())
+
+def _prepare_embedding_store():
+    """
+    Build the embedding store in this process if it is missing or stale, so
+    spawned batch workers map one shared version instead of each encoding
+    the catalog
+    """
+    from src.catalog import get_catalog
+    from src.config import Settings
+    from src.rag.embedding_store import compute_fingerprint, open_embedding_store
+
+    settings = Settings()
+    # The file the catalog serves, which may be the Parquet copy
+    product_path = get_catalog(settings).products.path
+    fingerprint = compute_fingerprint(product_path, settings.EMBEDDING_MODEL)
+    if open_embedding_store(settings.EMBEDDING_STORE_DIR, fingerprint) is not None:
+        return
+
+    from src.rag.assistant import ECommerceRAG
+
+    logger.info("Embedding store is missing or stale, building it before starting workers")
+    ECommerceRAG.from_settings(settings)
+
+def _process_batch_chunk(chunk):
+    """Answer a chunk of queries with one batched encode"""
+    responses = _batch_assistant.process_queries(
+        [(query.get('text', ''), query.get('customer_id')) for query in chunk]
+    )
+    return [{'query': query, 'response': response} for query, response in zip(chunk, responses)]
+
 @cli.command()
-@click.option('--input-file', required=True, help='Input file with queries')
-@click.option('--output-file', required=True, help='Output file for responses')
-def batch(input_file, output_file):
+@click.option('--input-file', required=True, help='Input JSONL file with queries (a JSON array is also accepted)')
+@click.option('--output-file', required=True, help='Output JSONL file for responses')
+@click.option('--workers', default=1, help='Number of worker processes')
+@click.option('--batch-size', default=256, help='Queries encoded together per batch')
+@click.option('--resume', is_flag=True, help='Skip queries already written to the output file and append after them')
+def batch(input_file, output_file, workers, batch_size, resume):
     """Run batch processing of queries"""
     try:
-        from src.rag.assistant import ECommerceRAG
-        from src.config import Settings
         import json
+        import time
+        import multiprocessing
+        from collections import deque
+        from itertools import islice
         
         # Setup
         setup_environment()
         check_data_files()
+
+        skip = count_completed_lines(output_file) if resume else 0
+        if skip:
+            logger.info(f"Resuming after {skip} completed queries")
+        elif not resume and Path(output_file).exists():
+            logger.warning(f"Overwriting existing output file {output_file} (pass --resume to continue it)")
+        queries = islice(read_queries(input_file), skip, None)
+        chunks = chunked(queries, batch_size)
+
+        if workers > 1:
+            _prepare_embedding_store()
+            # Spawned workers avoid inheriting torch thread state from the parent
+            pool = multiprocessing.get_context('spawn').Pool(workers, initializer=_init_batch_worker)
+            # Keep a bounded number of chunks in flight so input is streamed
+            pending = deque()
+            def results():
+                for chunk in chunks:
+                    pending.append(pool.apply_async(_process_batch_chunk, (chunk,)))
+                    if len(pending) >= workers * 2:
+                        yield pending.popleft().get()
+                while pending:
+                    yield pending.popleft().get()
+        else:
+            pool = None
+            _init_batch_worker()
+            results = lambda: (_process_batch_chunk(chunk) for chunk in chunks)
+
+        processed = 0
+        start = time.perf_counter()
+        try:
+            with open(output_file, 'a' if resume else 'w', encoding='utf-8') as f:
+                for records in results():
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    # Flush whole chunks so an interrupted run resumes cleanly
+                    f.flush()
+                    processed += len(records)
+                    elapsed = time.perf_counter() - start
+                    logger.info(
+                        f"Processed {skip + processed} queries "
+                        f"({processed / elapsed:.1f} queries/s)"
+                    )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
         
-        # Initialize RAG system
-        settings = Settings()
-        assistant = ECommerceRAG(
-            product_dataset_path=settings.PRODUCT_DATA_PATH,
-            order_dataset_path=settings.ORDER_DATA_PATH
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Processed {processed} queries in {elapsed:.1f}s "
+            f"({processed / elapsed if elapsed else 0:.1f} queries/s)"
         )
         
-        # Process queries
-        with open(input_file, 'r') as f:
-            queries = json.load(f)
-        
-        responses = []
-        for query in queries:
-            text = query.get('text', '')
-            customer_id = query.get('customer_id')
-            response = assistant.process_query(text, customer_id)
-            responses.append({
-                'query': query,
-                'response': response
-            })
-        
-        # Save responses
-        with open(output_file, 'w') as f:
-            json.dump(responses, f, indent=2)
-        
-        logger.info(f"Processed {len(queries)} queries")
-        
     except Exception as e:
         logger.error(f"Error in batch processing: {str(e)}")
         raise
 
+@cli.command('convert-data')
+@click.option('--to', 'target', type=click.Choice(['parquet', 'csv']), default='parquet',
+              help='Format to write the processed datasets in')
+def convert_data(target):
+    """Convert processed datasets between CSV and Parquet"""
+    try:
+        # Local imports to keep startup light
+        from src.storage import ORDER_DTYPES, PRODUCT_DTYPES, columnar_path, read_table, write_table
+
+        processed_dir = Path(__file__).parent.parent / 'data' / 'processed'
+        datasets = [
+            ('processed_products.csv', PRODUCT_DTYPES),
+            ('processed_orders.csv', ORDER_DTYPES)
+        ]
+        for name, dtypes in datasets:
+            csv_path = processed_dir / name
+            source, target_path = (
+                (csv_path, columnar_path(csv_path)) if target == 'parquet'
+                else (columnar_path(csv_path), csv_path)
+            )
+            if not source.exists():
+                raise FileNotFoundError(f"Missing {source}")
+            df = read_table(source)
+            write_table(df, target_path, dtypes)
+            logger.info(
+                f"Wrote {len(df)} rows to {target_path} "
+                f"({source.stat().st_size / 1e6:.1f} MB -> {target_path.stat().st_size / 1e6:.1f} MB)"
+            )
+        if target == 'parquet':
+            logger.info("Product data changed format: rerun preprocessing or let the API re-encode embeddings")
+
+    except Exception as e:
+        logger.error(f"Error converting data: {str(e)}")
+        raise
+
 @cli.command()
 def chat():
     """Run interactive chat in the terminal"""
@@ -159,10 +318,7 @@ def chat():
 
         # Initialize RAG assistant
         settings = Settings()
-        assistant = ECommerceRAG(
-            product_dataset_path=settings.PRODUCT_DATA_PATH,
-            order_dataset_path=settings.ORDER_DATA_PATH
-        )
+        assistant = ECommerceRAG.from_settings(settings)
 
         customer_id = None
         print("Chat started. Type 'set customer <id>' to set a customer, or 'exit' to quit.")
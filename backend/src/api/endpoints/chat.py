@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any, List
+import asyncio
+import threading
 from ...rag.assistant import ECommerceRAG
+from ...catalog import DataCatalog
 from ...config import Settings
+from ..inference import InferenceExecutor, ExecutorSaturated
 import logging
 
 router = APIRouter()
@@ -11,23 +15,94 @@ logger = logging.getLogger(__name__)
 
 # Initialize RAG assistant (singleton pattern)
 _rag_assistant = None
+_rag_lock = threading.Lock()
 
 def get_rag_assistant():
     """Get or initialize RAG assistant"""
     global _rag_assistant
     if _rag_assistant is None:
-        try:
-            _rag_assistant = ECommerceRAG(
-                product_dataset_path=str(settings.PRODUCT_DATA_PATH),
-                order_dataset_path=str(settings.ORDER_DATA_PATH),
-                model_name=settings.EMBEDDING_MODEL
-            )
-            logger.info("RAG assistant initialized successfully")
-        except Exception as e:
-            logger.error(f"Error initializing RAG assistant: {str(e)}")
-            raise
+        # Several inference threads may ask for the assistant at once
+        with _rag_lock:
+            if _rag_assistant is None:
+                try:
+                    _rag_assistant = ECommerceRAG.from_settings(settings)
+                    logger.info("RAG assistant initialized successfully")
+                except Exception as e:
+                    logger.error(f"Error initializing RAG assistant: {str(e)}")
+                    raise
     return _rag_assistant
 
+def rebuild_rag_assistant(catalog: DataCatalog) -> Optional[ECommerceRAG]:
+    """
+    Move this process's assistant onto a new catalog snapshot without
+    swapping it in; None if no assistant has been loaded yet
+    """
+    assistant = _rag_assistant
+    return assistant.reloaded(catalog) if assistant is not None else None
+
+def swap_rag_assistant(assistant: ECommerceRAG) -> None:
+    """Serve new queries from assistant; queries already running keep the old one"""
+    global _rag_assistant
+    with _rag_lock:
+        _rag_assistant = assistant
+
+def _process_query(query: str, customer_id: Optional[int]) -> str:
+    """Run a chat query on this worker's assistant (executed in the pool)"""
+    return get_rag_assistant().process_query(query=query, customer_id=customer_id)
+
+def _retrieve_products(query: str, limit: int, category: Optional[str],
+                       min_rating: Optional[float], max_price: Optional[float],
+                       mode: str) -> List[Dict[str, Any]]:
+    """
+    Find products with this worker's assistant (executed in the pool)
+
+    Rows are read from the catalog snapshot the assistant ranked, so the
+    records stay correct if the data is reloaded while the result is in flight.
+    """
+    assistant = get_rag_assistant()
+    ids, _ = assistant.retrieve(
+        query, limit, min_rating=min_rating, max_price=max_price, category=category, mode=mode
+    )
+    return assistant.product_df.iloc[ids].to_dict('records')
+
+def _init_inference_worker():
+    """Load the assistant when a process pool worker starts"""
+    get_rag_assistant()
+
+# Blocking inference runs in this pool so the event loop stays responsive
+_inference_executor = InferenceExecutor(
+    kind=settings.INFERENCE_EXECUTOR,
+    max_workers=settings.INFERENCE_WORKERS,
+    max_queue=settings.INFERENCE_MAX_QUEUE,
+    timeout=settings.INFERENCE_TIMEOUT,
+    initializer=_init_inference_worker
+)
+
+def shutdown_inference_executor():
+    """Stop the inference pool"""
+    _inference_executor.shutdown()
+
+def restart_inference_workers() -> bool:
+    """
+    Restart a process inference pool so its workers load the current data;
+    False for a thread pool, whose workers share this process's assistant
+    """
+    if _inference_executor.kind != "process":
+        return False
+    _inference_executor.restart()
+    return True
+
+async def retrieve_products(query: str, limit: int, category: Optional[str] = None,
+                            min_rating: Optional[float] = None, max_price: Optional[float] = None,
+                            mode: str = "hybrid") -> List[Dict[str, Any]]:
+    """
+    Retrieve product records through the assistant on the inference pool.
+    Raises ExecutorSaturated or asyncio.TimeoutError like chat queries do.
+    """
+    return await _inference_executor.run(
+        _retrieve_products, query, limit, category, min_rating, max_price, mode
+    )
+
 class ChatQuery(BaseModel):
     query: str
     customer_id: Optional[int] = None
@@ -41,12 +116,25 @@ async def chat_query(chat_query: ChatQuery):
     Process a chat query using the RAG assistant
     """
     try:
-        assistant = get_rag_assistant()
-        response = assistant.process_query(
-            query=chat_query.query,
-            customer_id=chat_query.customer_id
+        response = await _inference_executor.run(
+            _process_query,
+            chat_query.query,
+            chat_query.customer_id
         )
         return ChatResponse(response=response)
+    except ExecutorSaturated as e:
+        logger.warning(f"Rejecting chat query: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    except asyncio.TimeoutError:
+        logger.error("Chat query timed out")
+        raise HTTPException(
+            status_code=504,
+            detail="Query timed out"
+        )
     except Exception as e:
         logger.error(f"Error processing chat query: {str(e)}")
         raise HTTPException(
@@ -54,3 +142,13 @@ async def chat_query(chat_query: ChatQuery):
             detail=f"Error processing query: {str(e)}"
         )
 
+@router.get("/metrics", response_model=Dict[str, Any])
+async def chat_metrics():
+    """
+    Cache hit ratios and inference queue state for the chat assistant
+    """
+    metrics: Dict[str, Any] = {'inference': _inference_executor.stats()}
+    # With a process pool the assistants live in the worker processes
+    if _rag_assistant is not None:
+        metrics.update(_rag_assistant.cache_stats())
+    return metrics
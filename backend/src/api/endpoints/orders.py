@@ -1,24 +1,19 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict, Any
 import pandas as pd
-from ...config import Settings
+from ...catalog import get_catalog
 
 router = APIRouter()
-settings = Settings()
 
-# Load order data
-try:
-    ORDER_DF = pd.read_csv(settings.ORDER_DATA_PATH)
-    # Fill NaN values appropriately by dtype (avoid chained assignment warning)
-    for col in ORDER_DF.columns:
-        if ORDER_DF[col].dtype == 'object':
-            ORDER_DF[col] = ORDER_DF[col].fillna('')
-        else:
-            ORDER_DF[col] = ORDER_DF[col].fillna(0)
-    print(f"Successfully loaded orders data from {settings.ORDER_DATA_PATH}")
-except Exception as e:
-    print(f"Error loading orders data: {str(e)}")
-    ORDER_DF = None
+# Order times are parsed for indexing but served as in the source data
+ORDER_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def _order_records(orders: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Order rows as JSON records, with Order_DateTime formatted as in the source data"""
+    column = orders.get('Order_DateTime')
+    if column is not None and pd.api.types.is_datetime64_any_dtype(column):
+        orders = orders.assign(Order_DateTime=column.dt.strftime(ORDER_DATETIME_FORMAT).fillna(''))
+    return orders.to_dict('records')
 
 @router.get("/customer/{customer_id}", response_model=List[Dict[str, Any]])
 async def get_customer_orders(
@@ -26,26 +21,18 @@ async def get_customer_orders(
     limit: int = Query(default=10, ge=1, le=100)
 ):
     """Retrieve orders for a specific customer"""
-    if ORDER_DF is None:
-        raise HTTPException(status_code=500, detail="Order data not loaded")
+    orders = get_catalog().orders
     
-    customer_orders = ORDER_DF[ORDER_DF['Customer_Id'] == customer_id].copy()
+    # The customer's latest orders, already sorted by date descending
+    rows = orders.customer_index.lookup(customer_id, limit)
     
-    if customer_orders.empty:
+    if len(rows) == 0:
         raise HTTPException(
             status_code=404, 
             detail=f"No orders found for customer {customer_id}"
         )
     
-    # Sort by date descending and limit results
-    if 'Order_DateTime' in customer_orders.columns:
-        customer_orders = customer_orders.sort_values('Order_DateTime', ascending=False)
-    elif 'Order_Date' in customer_orders.columns:
-        customer_orders = customer_orders.sort_values('Order_Date', ascending=False)
-    
-    customer_orders = customer_orders.head(limit)
-    
-    return customer_orders.to_dict('records')
+    return _order_records(orders.df.iloc[rows])
 
 @router.get("/priority/{priority}", response_model=List[Dict[str, Any]])
 async def get_orders_by_priority(
@@ -53,25 +40,15 @@ async def get_orders_by_priority(
     limit: int = Query(default=10, ge=1, le=100)
 ):
     """Retrieve orders with specific priority level"""
-    if ORDER_DF is None:
-        raise HTTPException(status_code=500, detail="Order data not loaded")
+    orders = get_catalog().orders
     
-    priority_orders = ORDER_DF[
-        ORDER_DF['Order_Priority'].str.lower() == priority.lower()
-    ].copy()
+    # The priority's latest orders, already sorted by date descending
+    rows = orders.priority_index.lookup(priority, limit)
     
-    if priority_orders.empty:
+    if len(rows) == 0:
         raise HTTPException(
             status_code=404,
             detail=f"No orders found with priority '{priority}'"
         )
     
-    # Sort by date descending and limit results
-    if 'Order_DateTime' in priority_orders.columns:
-        priority_orders = priority_orders.sort_values('Order_DateTime', ascending=False)
-    elif 'Order_Date' in priority_orders.columns:
-        priority_orders = priority_orders.sort_values('Order_Date', ascending=False)
-    
-    priority_orders = priority_orders.head(limit)
-    
-    return priority_orders.to_dict('records')
\ No newline at end of file
+    return _order_records(orders.df.iloc[rows])
\ No newline at end of file
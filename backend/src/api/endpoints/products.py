@@ -1,55 +1,26 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict, Any, Optional
-import pandas as pd
-from ...config import Settings
+import asyncio
+import logging
+import numpy as np
+from ...catalog import get_catalog
+from ...rag.vector_index import top_k
+from ..inference import ExecutorSaturated
+from .chat import retrieve_products
 
 router = APIRouter()
-settings = Settings()
-
-# Load product data
-PRODUCT_DF = pd.read_csv(settings.PRODUCT_DATA_PATH)
-PRODUCT_DF.fillna('', inplace=True)
-
-# Fix empty descriptions using feature_list or features
-def fix_description(row):
-    desc = str(row.get('Description', ''))
-    if not desc or desc == 'nan' or desc.strip() == '[]':
-        # Try feature_list first (processed data)
-        if 'feature_list' in row and row['feature_list']:
-             return str(row['feature_list'])
-        # Try features (raw data)
-        if 'features' in row and row['features']:
-             return str(row['features'])
-    return desc
-
-PRODUCT_DF['Description'] = PRODUCT_DF.apply(fix_description, axis=1)
+logger = logging.getLogger(__name__)
 
 def find_product_by_id(product_id: str):
     """
     Find a product by ID, supporting both ASIN (string) and numeric ID formats.
     Returns the product row or None if not found.
     """
-    # Try string match first (for ASIN format like "B09RCVDQ8M")
-    string_match = PRODUCT_DF[PRODUCT_DF['Product_ID'].astype(str) == str(product_id)]
-    if not string_match.empty:
-        return string_match.iloc[0]
-    
-    # Try numeric match (if Product_ID is numeric)
-    try:
-        numeric_id = int(product_id)
-        numeric_match = PRODUCT_DF[PRODUCT_DF['Product_ID'] == numeric_id]
-        if not numeric_match.empty:
-            return numeric_match.iloc[0]
-    except (ValueError, TypeError):
-        pass
-    
-    # Also check if there's a parent_asin column in raw data
-    if 'parent_asin' in PRODUCT_DF.columns:
-        asin_match = PRODUCT_DF[PRODUCT_DF['parent_asin'].astype(str) == str(product_id)]
-        if not asin_match.empty:
-            return asin_match.iloc[0]
-    
-    return None
+    products = get_catalog().products
+    position = products.id_index.lookup(product_id)
+    if position is None:
+        return None
+    return products.df.iloc[position]
 
 @router.get("/search", response_model=List[Dict[str, Any]])
 async def search_products(
@@ -57,54 +28,70 @@ async def search_products(
     category: Optional[str] = None,
     min_rating: Optional[float] = None,
     max_price: Optional[float] = None,
-    limit: int = Query(default=10, ge=1, le=50)
+    limit: int = Query(default=10, ge=1, le=50),
+    mode: str = Query(default="lexical", pattern="^(lexical|semantic|hybrid)$")
 ):
     """
-    Search products with various filters
+    Search products with various filters, ranked by BM25 relevance.
+    mode=semantic ranks by embedding similarity, mode=hybrid fuses both rankings.
     """
-    # Start with all products
-    filtered_products = PRODUCT_DF.copy()
-    
-    # Apply search query across multiple fields
-    if query:
-        search_mask = (
-            filtered_products['Product_Title'].str.contains(query, case=False, na=False) |
-            filtered_products['Description'].str.contains(query, case=False, na=False) |
-            filtered_products['Category'].str.contains(query, case=False, na=False)
-        )
-        filtered_products = filtered_products[search_mask]
+    if mode != "lexical":
+        return await _search_with_assistant(query, category, min_rating, max_price, limit, mode)
+
+    products = get_catalog().products
     
-    # Apply category filter
+    # Documents containing every query term, with their BM25 scores
+    candidates, scores = products.lexical_index.score(query)
+    keep = np.ones(len(candidates), dtype=bool)
+    
+    # Apply category filter (literal substring, any case, as on the other search paths)
     if category:
-        filtered_products = filtered_products[
-            filtered_products['Category'].str.contains(category, case=False, na=False)
-        ]
+        keep &= products.category_mask(category)[candidates]
     
     # Apply rating filter
     if min_rating is not None:
-        filtered_products = filtered_products[
-            filtered_products['Rating'] >= min_rating
-        ]
+        keep &= products.ratings[candidates] >= min_rating
     
     # Apply price filter
     if max_price is not None:
-        filtered_products = filtered_products[
-            filtered_products['Price'] <= max_price
-        ]
+        keep &= products.prices[candidates] <= max_price
     
-    if filtered_products.empty:
+    candidates, scores = candidates[keep], scores[keep]
+    if len(candidates) == 0:
         raise HTTPException(
             status_code=404,
             detail="No products found matching the criteria"
         )
     
-    # Sort by relevance (currently using rating as a proxy)
-    filtered_products = filtered_products.sort_values('Rating', ascending=False)
+    # Take the most relevant results
+    best = candidates[top_k(scores, limit)]
     
-    # Limit results
-    filtered_products = filtered_products.head(limit)
+    return products.df.iloc[best].to_dict('records')
+
+async def _search_with_assistant(query, category, min_rating, max_price, limit, mode):
+    """Rank products with the chat assistant's retrievers"""
+    try:
+        records = await retrieve_products(query, limit, category, min_rating, max_price, mode)
+    except ExecutorSaturated as e:
+        logger.warning(f"Rejecting {mode} search: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail="Search timed out"
+        )
     
-    return filtered_products.to_dict('records')
+    if not records:
+        raise HTTPException(
+            status_code=404,
+            detail="No products found matching the criteria"
+        )
+    
+    return records
 
 @router.get("/category/{category}", response_model=List[Dict[str, Any]])
 async def get_products_by_category(
@@ -115,28 +102,21 @@ async def get_products_by_category(
     """
     Retrieve products in a specific category
     """
-    # Filter by category
-    category_products = PRODUCT_DF[
-        PRODUCT_DF['Category'].str.contains(category, case=False, na=False)
-    ].copy()
+    products = get_catalog().products
     
-    if category_products.empty:
+    # Category rows are precomputed in rating order
+    category_rows = products.category_index.rows(category)
+    
+    if len(category_rows) == 0:
         raise HTTPException(
             status_code=404,
             detail=f"No products found in category '{category}'"
         )
     
-    # Apply rating filter if specified
-    if min_rating is not None:
-        category_products = category_products[
-            category_products['Rating'] >= min_rating
-        ]
-    
-    # Sort by rating and limit results
-    category_products = category_products.sort_values('Rating', ascending=False)
-    category_products = category_products.head(limit)
+    # Apply rating filter and limit results
+    best = products.category_index.top(category_rows, limit, min_rating)
     
-    return category_products.to_dict('records')
+    return products.df.iloc[best].to_dict('records')
 
 @router.get("/top-rated", response_model=List[Dict[str, Any]])
 async def get_top_rated_products(
@@ -147,26 +127,20 @@ async def get_top_rated_products(
     """
     Get top-rated products with optional category filter
     """
-    # Filter by rating
-    top_products = PRODUCT_DF[PRODUCT_DF['Rating'] >= min_rating].copy()
+    products = get_catalog().products
     
-    # Apply category filter if specified
-    if category:
-        top_products = top_products[
-            top_products['Category'].str.contains(category, case=False, na=False)
-        ]
+    # All rows, or the category's rows, already sorted by rating
+    best = products.category_index.top(
+        products.category_index.rows(category), limit, min_rating
+    )
     
-    if top_products.empty:
+    if len(best) == 0:
         raise HTTPException(
             status_code=404,
             detail="No products found matching the criteria"
         )
     
-    # Sort by rating and limit results
-    top_products = top_products.sort_values('Rating', ascending=False)
-    top_products = top_products.head(limit)
-    
-    return top_products.to_dict('records')
+    return products.df.iloc[best].to_dict('records')
 
 @router.get("/{product_id}", response_model=Dict[str, Any])
 async def get_product_by_id(product_id: str):
@@ -186,48 +160,75 @@ async def get_product_by_id(product_id: str):
 @router.get("/recommendations/{product_id}", response_model=List[Dict[str, Any]])
 async def get_product_recommendations(
     product_id: str,
-    limit: int = Query(default=5, ge=1, le=20)
+    limit: int = Query(default=5, ge=1, le=20),
+    same_category: bool = False,
+    min_rating: Optional[float] = None,
+    rating_weight: float = Query(default=0.0, ge=0, le=1)
 ):
     """
-    Get product recommendations based on category and rating.
+    Get product recommendations, most similar products first.
+    same_category and min_rating restrict the neighbours, and rating_weight
+    blends the rating (scaled to 0-1) into the similarity score.
+    Without a neighbour table, the highest-rated products in the same category are returned.
     Supports both ASIN (string) and numeric ID formats.
     """
-    # Get the target product using the helper function
-    target_product = find_product_by_id(product_id)
+    products = get_catalog().products
     
-    if target_product is None:
+    # Get the target product's row
+    position = products.id_index.lookup(product_id)
+    
+    if position is None:
         raise HTTPException(
             status_code=404,
             detail=f"Product with ID {product_id} not found"
         )
     
-    # Get the product ID for comparison (handle both string and numeric)
-    target_product_id = target_product['Product_ID']
-    
-    # Find similar products in the same category, excluding the target product
-    similar_products = PRODUCT_DF[
-        (PRODUCT_DF['Category'] == target_product['Category']) &
-        (PRODUCT_DF['Product_ID'].astype(str) != str(target_product_id))
-    ].copy()
+    if products.neighbors is not None:
+        rows = _similar_products(products, position, limit, same_category, min_rating, rating_weight)
+    else:
+        rows = _category_products(products, position, limit, min_rating)
     
-    if similar_products.empty:
+    if len(rows) == 0:
         raise HTTPException(
             status_code=404,
             detail="No similar products found"
         )
     
-    # Sort by rating and limit results
-    similar_products = similar_products.sort_values('Rating', ascending=False)
-    similar_products = similar_products.head(limit)
-    
-    return similar_products.to_dict('records')
+    return products.df.iloc[rows].to_dict('records')
+
+def _similar_products(products, position, limit, same_category, min_rating, rating_weight):
+    """Rank the product's precomputed neighbours, excluding copies of the product itself"""
+    rows, similarities = products.neighbors.neighbors(position)
+    keep = products.id_index.row_ids[rows] != products.id_index.row_ids[position]
+    if same_category:
+        keep &= products.categories[rows] == products.categories[position]
+    if min_rating is not None:
+        keep &= products.ratings[rows] >= min_rating
+    rows, scores = rows[keep], similarities[keep].astype(np.float32)
+    
+    if rating_weight:
+        scores = scores + rating_weight * np.nan_to_num(products.ratings[rows]) / 5.0
+        return rows[top_k(scores, limit)]
+    # Neighbours are already stored most similar first
+    return rows[:limit]
+
+def _category_products(products, position, limit, min_rating):
+    """Highest-rated products in the same category, excluding the product itself"""
+    target_product_id = products.id_index.row_ids[position]
+    
+    # Only rows near the head are checked unless the target shows up often
+    category_rows = products.category_index.exact(products.categories[position])
+    head = category_rows[:limit + 1]
+    similar_rows = head[products.id_index.row_ids[head] != target_product_id]
+    if len(similar_rows) < limit and len(head) < len(category_rows):
+        similar_rows = category_rows[products.id_index.row_ids[category_rows] != target_product_id]
+    
+    return products.category_index.top(similar_rows, limit, min_rating)
 
 @router.get("/categories/list", response_model=List[str])
 async def get_categories():
     """
     Get all unique product categories
     """
-    categories = PRODUCT_DF['Category'].dropna().unique().tolist()
-    categories = [cat for cat in categories if cat]  # Remove empty strings
-    categories.sort()
-    return categories
\ No newline at end of file
+    # Non-empty category names, sorted when the index was built
+    return get_catalog().products.category_index.names
\ No newline at end of file
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the inference executor has no room for another request"""
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model inference off the asyncio event loop
+
+    Work goes to a thread or process pool. At most max_workers tasks run at
+    once and at most max_queue more wait; beyond that, submit raises
+    ExecutorSaturated so callers can shed load instead of queueing forever.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4, max_queue: int = 32,
+                 timeout: Optional[float] = 30.0,
+                 initializer: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            kind: "thread" or "process"
+            max_workers: Number of pool workers
+            max_queue: Number of tasks allowed to wait for a free worker
+            timeout: Seconds a caller waits for its result, None for no limit
+            initializer: Called once in each worker process (process pools only)
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind '{kind}', use 'thread' or 'process'")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._initializer = initializer
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # Spawned workers avoid inheriting torch thread state from the parent
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self._initializer
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference"
+                )
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run fn(*args) in the pool and await its result
+
+        Raises:
+            ExecutorSaturated: If capacity is exhausted
+            asyncio.TimeoutError: If the result is not ready within timeout
+        """
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise ExecutorSaturated(
+                    f"Inference queue is full ({self._pending} requests pending)"
+                )
+            executor = self._get_executor()
+            self._pending += 1
+
+        try:
+            future = executor.submit(fn, *args)
+        except Exception as e:
+            with self._lock:
+                self._pending -= 1
+                if isinstance(e, BrokenProcessPool) and self._executor is executor:
+                    self._executor = None
+            raise
+        # The slot is released when the task finishes, not when the caller
+        # gives up, so timed-out work still counts against capacity
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next request
+            logger.error("Inference process pool broke, restarting it")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and outcome counters"""
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'pending': self._pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts
+        }
+
+    def restart(self) -> None:
+        """
+        Replace the pool's workers with fresh ones on the next submit; tasks
+        already submitted finish on the old workers
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        """Stop the pool, cancelling tasks that have not started"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,13 +1,42 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .endpoints import orders, products, chat
+from .reload import last_reload, reload_data, request_reload, watch_data, watch_reload_requests
+from .security import require_admin_token
+from ..catalog import get_catalog
 from ..config import Settings
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load the data catalog on startup, watch it and other workers' reload
+    requests for changes, and release worker pools on shutdown
+    """
+    settings = Settings()
+    get_catalog(settings)
+    watchers = []
+    if settings.DATA_RELOAD_INTERVAL > 0:
+        watchers.append(asyncio.create_task(watch_data(settings, settings.DATA_RELOAD_INTERVAL)))
+    if settings.RELOAD_REQUEST_POLL_INTERVAL > 0:
+        watchers.append(asyncio.create_task(
+            watch_reload_requests(settings, settings.RELOAD_REQUEST_POLL_INTERVAL)
+        ))
+    yield
+    for watcher in watchers:
+        watcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await watcher
+    chat.shutdown_inference_executor()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="E-commerce Dataset API",
     description="API for querying e-commerce sales data",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -30,6 +59,28 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+# Data catalog endpoint
+@app.get("/catalog")
+async def catalog_stats():
+    """Snapshot version, row counts, load timings and memory footprint of the shared data catalog"""
+    stats = get_catalog().stats()
+    stats['last_reload'] = last_reload()
+    return stats
+
+@app.post("/catalog/reload", dependencies=[Depends(require_admin_token)])
+async def catalog_reload(force: bool = False):
+    """
+    Load changed product and order files into a new snapshot and swap it in
+
+    The report is for the worker that served this request; other API
+    worker processes pick up the same request from the reload request file.
+    """
+    settings = Settings()
+    request_id = request_reload(settings, force)
+    report = await asyncio.to_thread(reload_data, settings, force, request_id)
+    report['request_id'] = request_id
+    return report
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -38,7 +89,8 @@ async def root():
         "name": "E-commerce Dataset API",
         "version": "1.0.0",
         "documentation": "/docs",
-        "health_check": "/health"
+        "health_check": "/health",
+        "catalog": "/catalog"
     }
 
 if __name__ == "__main__":
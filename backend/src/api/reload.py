@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from ..catalog import get_catalog, reload_catalog, source_signatures, swap_catalog
+from ..config import Settings
+from .endpoints import chat
+
+logger = logging.getLogger(__name__)
+
+# One reload at a time; a request arriving during a reload waits for it
+_reload_lock = threading.Lock()
+_last_reload: Dict[str, Any] = {}
+# Id of the last reload request file entry this process has acted on
+_handled_request: Dict[str, Optional[str]] = {'id': None}
+
+
+def reload_data(settings: Optional[Settings] = None, force: bool = False,
+                request_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load changed data files into a new snapshot and swap it in
+
+    The catalog and chat assistant for the new snapshot are built first,
+    while requests keep being served from the current ones; the swap itself
+    only replaces two references. A process inference pool has no
+    assistant in this process, so it is restarted and its new workers load
+    the new snapshot.
+
+    Args:
+        settings: Settings to read file locations from
+        force: Reload every dataset even if its files are unchanged
+        request_id: Id of the broadcast reload request being served, if any
+
+    Returns:
+        Reload report: whether anything changed, the snapshot version,
+        reloaded and reused datasets, how the chat assistant was updated,
+        and build and swap durations in seconds
+    """
+    settings = settings or Settings()
+    with _reload_lock:
+        if request_id is not None:
+            _handled_request['id'] = request_id
+        start = time.perf_counter()
+        catalog = reload_catalog(settings, force=force)
+        if catalog is None:
+            return {'reloaded': False, 'version': get_catalog().version, 'pid': os.getpid()}
+
+        assistant = chat.rebuild_rag_assistant(catalog)
+        build_seconds = time.perf_counter() - start
+
+        swap_start = time.perf_counter()
+        swap_catalog(catalog)
+        if assistant is not None:
+            chat.swap_rag_assistant(assistant)
+            chat_status = 'swapped'
+        elif chat.restart_inference_workers():
+            chat_status = 'workers restarted'
+        else:
+            # Loaded from the new snapshot on first use
+            chat_status = 'not loaded'
+        swap_seconds = time.perf_counter() - swap_start
+
+        report = {
+            'reloaded': True,
+            'version': catalog.version,
+            'datasets': [name for name in catalog.signatures if name not in catalog.reused],
+            'reused': list(catalog.reused),
+            'chat': chat_status,
+            'pid': os.getpid(),
+            'build_seconds': build_seconds,
+            'swap_seconds': swap_seconds,
+            'completed_at': time.time()
+        }
+        _last_reload.clear()
+        _last_reload.update(report)
+        logger.info(
+            f"Swapped in data snapshot v{catalog.version} ({', '.join(report['datasets'])}) "
+            f"built in {build_seconds:.2f}s, swapped in {swap_seconds * 1e6:.0f}us, chat {chat_status}"
+        )
+        return report
+
+
+def last_reload() -> Dict[str, Any]:
+    """Report of the most recent reload that swapped in a snapshot, empty if none has"""
+    return dict(_last_reload)
+
+
+def request_reload(settings: Settings, force: bool = False) -> str:
+    """
+    Ask every API worker process to reload by writing a new reload request
+
+    Args:
+        settings: Settings with the request file location
+        force: Reload every dataset even if its files are unchanged
+
+    Returns:
+        Id of the request
+    """
+    request = {'id': uuid.uuid4().hex, 'force': force, 'requested_at': time.time()}
+    path = settings.RELOAD_REQUEST_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(request), encoding='utf-8')
+    # This process serves the request itself, its watcher must not repeat it
+    _handled_request['id'] = request['id']
+    os.replace(tmp_path, path)
+    return request['id']
+
+
+def read_reload_request(settings: Settings) -> Optional[Dict[str, Any]]:
+    """The latest reload request, None if there is none or it is unreadable"""
+    try:
+        return json.loads(settings.RELOAD_REQUEST_PATH.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+async def watch_reload_requests(settings: Settings, interval: float) -> None:
+    """
+    Serve reload requests written by another worker's POST /catalog/reload
+
+    Requests older than this process are not replayed.
+
+    Args:
+        settings: Settings to read file locations from
+        interval: Seconds between polls of the request file
+    """
+    request = read_reload_request(settings)
+    if _handled_request['id'] is None and request is not None:
+        _handled_request['id'] = request.get('id')
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            request = read_reload_request(settings)
+            if request is not None and request.get('id') != _handled_request['id']:
+                logger.info(f"Serving reload request {request.get('id')}")
+                await asyncio.to_thread(
+                    reload_data, settings, bool(request.get('force')), request.get('id')
+                )
+        except Exception as e:
+            logger.error(f"Error serving reload request: {str(e)}")
+
+
+async def watch_data(settings: Settings, interval: float) -> None:
+    """
+    Poll the data files and reload once they have changed and settled
+
+    A change is only loaded when the files look the same on two polls in a
+    row, so a snapshot is not built from half-written preprocessing output.
+
+    Args:
+        settings: Settings to read file locations from
+        interval: Seconds between polls
+    """
+    last_seen = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            signatures = source_signatures(settings)
+            if signatures != get_catalog().signatures and signatures == last_seen:
+                await asyncio.to_thread(reload_data, settings)
+            last_seen = signatures
+        except Exception as e:
+            logger.error(f"Error reloading data: {str(e)}")
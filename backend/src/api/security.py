@@ -0,0 +1,24 @@
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from ..config import Settings
+
+settings = Settings()
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """
+    Allow a request only if its X-Admin-Token header matches ADMIN_TOKEN
+
+    Admin endpoints are disabled while no ADMIN_TOKEN is configured.
+
+    Raises:
+        HTTPException: 403 if admin endpoints are disabled, 401 if the token
+            is missing or wrong
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
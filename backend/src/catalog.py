@@ -0,0 +1,411 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .cleaning import fill_empty_text
+from .config import Settings
+from .indexes import (
+    CategoryIndex,
+    CustomerOrderIndex,
+    PriorityOrderIndex,
+    ProductIdIndex,
+)
+from .rag.embedding_store import compute_fingerprint, file_digest
+from .rag.lexical import BM25Index, build_lexical_texts
+from .rag.neighbors import NeighborTable
+from .storage import ORDER_DTYPES, PRODUCT_DTYPES, apply_dtypes, preferred_path, read_table
+
+logger = logging.getLogger(__name__)
+
+# Raw product dataset columns and their processed names
+RAW_PRODUCT_COLUMNS = {
+    'title': 'Product_Title',
+    'average_rating': 'Rating',
+    'description': 'Description',
+    'features': 'Features',
+    'price': 'Price',
+    'parent_asin': 'Product_ID',
+    'main_category': 'Category'
+}
+
+# Columns tried, in order, when a product has no description
+DESCRIPTION_FALLBACKS = ('Features', 'feature_list', 'features')
+
+
+def _fill_missing(df: pd.DataFrame) -> pd.DataFrame:
+    """Fill missing text with '' and missing numbers with 0 so rows serialize to JSON"""
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]) or not df[col].hasnans:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            if '' not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories('')
+            df[col] = df[col].fillna('')
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].fillna(0)
+        else:
+            df[col] = df[col].fillna('')
+    return df
+
+
+def _float_column(df: pd.DataFrame, col: str) -> np.ndarray:
+    """A numeric column as contiguous float32, NaN where missing"""
+    if col not in df.columns:
+        return np.full(len(df), np.nan, dtype=np.float32)
+    return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float32)
+
+
+def normalize_products(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring raw or processed product data into the processed schema,
+    with the column types of PRODUCT_DTYPES
+
+    Args:
+        df: Product DataFrame as read from disk
+
+    Returns:
+        The normalized DataFrame
+    """
+    if 'Product_Title' not in df.columns:
+        for old_col, new_col in RAW_PRODUCT_COLUMNS.items():
+            if old_col in df.columns and new_col not in df.columns:
+                df[new_col] = df[old_col]
+
+    for col in ('Rating', 'Price'):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    if 'Category' not in df.columns:
+        df['Category'] = ''
+    if 'Description' not in df.columns:
+        df['Description'] = ''
+
+    _fill_missing(df)
+
+    # Fill empty descriptions from the first feature column with text
+    fill_empty_text(df, 'Description', DESCRIPTION_FALLBACKS)
+    return apply_dtypes(df, PRODUCT_DTYPES)
+
+
+def normalize_orders(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring raw or processed order data into the processed schema
+
+    Order_DateTime is parsed to datetime64 (combined from Order_Date and
+    Time in raw data) and columns get the types of ORDER_DTYPES, with
+    low-cardinality columns as categoricals.
+
+    Args:
+        df: Order DataFrame as read from disk
+
+    Returns:
+        The normalized DataFrame
+    """
+    if 'Order_DateTime' in df.columns:
+        if not pd.api.types.is_datetime64_any_dtype(df['Order_DateTime']):
+            df['Order_DateTime'] = pd.to_datetime(df['Order_DateTime'], errors='coerce')
+    elif 'Order_Date' in df.columns and 'Time' in df.columns:
+        df['Order_DateTime'] = pd.to_datetime(
+            df['Order_Date'].astype(str) + ' ' + df['Time'].astype(str), errors='coerce'
+        )
+    else:
+        logger.warning("Order data missing datetime information")
+
+    _fill_missing(df)
+    return apply_dtypes(df, ORDER_DTYPES)
+
+
+def _file_signature(paths: Sequence[Path]) -> Tuple:
+    """(path, size, mtime) of each file, None for missing ones, so any rewrite is noticed"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((str(path), stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((str(path), None, None))
+    return tuple(signature)
+
+
+def _source_files(product_path: Union[str, Path], order_path: Union[str, Path],
+                  lexical_index_path: Optional[Union[str, Path]] = None,
+                  neighbor_table_path: Optional[Union[str, Path]] = None,
+                  watch_paths: Sequence[Union[str, Path]] = ()) -> Dict[str, List[Path]]:
+    """Files each dataset of a catalog is built from"""
+    product_files = [product_path, lexical_index_path, neighbor_table_path, *watch_paths]
+    return {
+        'products': [Path(path) for path in product_files if path is not None],
+        'orders': [Path(order_path)]
+    }
+
+
+def _settings_sources(settings: Settings) -> Dict[str, Any]:
+    """Catalog file arguments from Settings, resolving Parquet copies written since startup"""
+    return {
+        'product_path': preferred_path(settings.PRODUCT_DATA_PATH),
+        'order_path': preferred_path(settings.ORDER_DATA_PATH),
+        'lexical_index_path': settings.LEXICAL_INDEX_PATH,
+        'neighbor_table_path': settings.NEIGHBOR_TABLE_PATH,
+        # Built by preprocessing alongside the product data
+        'watch_paths': (settings.VECTOR_INDEX_PATH,)
+    }
+
+
+def source_signatures(settings: Settings) -> Dict[str, Tuple]:
+    """Current signature of the files each dataset is loaded from"""
+    return {
+        name: _file_signature(paths)
+        for name, paths in _source_files(**_settings_sources(settings)).items()
+    }
+
+
+class ProductCatalog:
+    """Product rows with their filter columns and lookup indexes"""
+
+    def __init__(self, df: pd.DataFrame, path: Path, lexical_index: BM25Index,
+                 neighbors: Optional[NeighborTable] = None):
+        self.df = df
+        self.path = path
+        self.lexical_index = lexical_index
+        self.neighbors = neighbors
+        self.ratings = _float_column(df, 'Rating')
+        self.prices = _float_column(df, 'Price')
+        self.categories = df['Category'].astype(str).to_numpy(dtype=object)
+        self.id_index = ProductIdIndex(df)
+        self.category_index = CategoryIndex(df['Category'], self.ratings)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def category_mask(self, category: str) -> np.ndarray:
+        """Boolean row mask of products whose category contains category (any case)"""
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[self.category_index.rows(category)] = True
+        return mask
+
+
+class OrderCatalog:
+    """Order rows with their customer and priority indexes"""
+
+    def __init__(self, df: pd.DataFrame, path: Path):
+        self.df = df
+        self.path = path
+        order_times = df['Order_DateTime'] if 'Order_DateTime' in df.columns else None
+        self.customer_index = CustomerOrderIndex(df['Customer_Id'], order_times)
+        self.priority_index = PriorityOrderIndex(df['Order_Priority'], order_times)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+
+class DataCatalog:
+    """
+    Products and orders, loaded, normalized and indexed once per process
+
+    The API routers and the RAG assistant share one catalog, so each
+    dataset is parsed and held in memory a single time. A catalog is an
+    immutable snapshot: reloading builds a new one with the next version,
+    reusing every dataset whose files are unchanged, and swaps it in.
+    """
+
+    def __init__(self, product_path: Union[str, Path], order_path: Union[str, Path],
+                 lexical_index_path: Optional[Union[str, Path]] = None,
+                 neighbor_table_path: Optional[Union[str, Path]] = None,
+                 model_name: str = "all-MiniLM-L6-v2",
+                 product_columns: Optional[Sequence[str]] = None,
+                 order_columns: Optional[Sequence[str]] = None,
+                 watch_paths: Sequence[Union[str, Path]] = (),
+                 previous: Optional["DataCatalog"] = None,
+                 reuse: bool = True):
+        """
+        Args:
+            product_path: Product dataset (Parquet or CSV)
+            order_path: Order dataset (Parquet or CSV)
+            lexical_index_path: Persisted BM25 index, built in memory if missing or stale
+            neighbor_table_path: Persisted neighbour table for recommendations
+            model_name: Embedding model the neighbour table must come from
+            product_columns: Product columns to load from Parquet, None for all
+            order_columns: Order columns to load from Parquet, None for all
+            watch_paths: Other files derived from the products; a change to
+                any of them counts as a product change
+            previous: Snapshot this one replaces; datasets whose files are
+                unchanged are shared with it instead of reloaded
+            reuse: Whether to share unchanged datasets with previous
+        """
+        self.timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        self.version = previous.version + 1 if previous is not None else 1
+        self.created_at = time.time()
+        # Signatures are taken before reading, so a write during the load
+        # shows up as a change on the next reload
+        self.signatures = {
+            name: _file_signature(paths)
+            for name, paths in _source_files(
+                product_path, order_path, lexical_index_path, neighbor_table_path, watch_paths
+            ).items()
+        }
+        self.reused: List[str] = [
+            name for name, signature in self.signatures.items()
+            if reuse and previous is not None and previous.signatures.get(name) == signature
+        ]
+
+        if 'products' in self.reused:
+            self.products = previous.products
+        else:
+            self.products = self._load_products(
+                Path(product_path), lexical_index_path, neighbor_table_path, model_name, product_columns
+            )
+
+        if 'orders' in self.reused:
+            self.orders = previous.orders
+        else:
+            stage_start = time.perf_counter()
+            order_path = Path(order_path)
+            order_df = normalize_orders(read_table(order_path, order_columns))
+            self.timings['orders'] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            self.orders = OrderCatalog(order_df, order_path)
+            self.timings['order_indexes'] = time.perf_counter() - stage_start
+
+        self.timings['total'] = time.perf_counter() - start
+        logger.info(
+            f"Loaded catalog v{self.version}: {len(self.products)} products and "
+            f"{len(self.orders)} orders in {self.timings['total']:.2f}s"
+            + (f" (reused {', '.join(self.reused)})" if self.reused else "")
+        )
+
+    def _load_products(self, product_path: Path,
+                       lexical_index_path: Optional[Union[str, Path]],
+                       neighbor_table_path: Optional[Union[str, Path]],
+                       model_name: str,
+                       product_columns: Optional[Sequence[str]]) -> ProductCatalog:
+        """Read the product dataset and load or build its indexes"""
+        stage_start = time.perf_counter()
+        product_df = normalize_products(read_table(product_path, product_columns))
+        self.timings['products'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        lexical_index = None
+        if lexical_index_path is not None:
+            lexical_index = BM25Index.load(lexical_index_path, file_digest(product_path))
+        if lexical_index is None:
+            logger.info("Building lexical index for product search")
+            lexical_index = BM25Index.build(build_lexical_texts(product_df))
+        self.timings['lexical_index'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        neighbors = None
+        if neighbor_table_path is not None:
+            neighbors = NeighborTable.load(
+                neighbor_table_path,
+                compute_fingerprint(product_path, model_name),
+                expected_rows=len(product_df)
+            )
+            if neighbors is None:
+                logger.info("No neighbour table found, recommending by category rating")
+        self.timings['neighbors'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        products = ProductCatalog(product_df, product_path, lexical_index, neighbors)
+        self.timings['product_indexes'] = time.perf_counter() - stage_start
+        return products
+
+    @classmethod
+    def from_settings(cls, settings: Settings, previous: Optional["DataCatalog"] = None,
+                      reuse: bool = True) -> "DataCatalog":
+        """Create a catalog configured from application Settings"""
+        return cls(
+            model_name=settings.EMBEDDING_MODEL,
+            previous=previous,
+            reuse=reuse,
+            **_settings_sources(settings)
+        )
+
+    def changed(self, settings: Settings) -> List[str]:
+        """Datasets whose files on disk differ from the ones this snapshot was built from"""
+        return [
+            name for name, signature in source_signatures(settings).items()
+            if signature != self.signatures.get(name)
+        ]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by each dataset and its indexes (walks every string, so not free)"""
+        products = self.products
+        orders = self.orders
+        lexical = products.lexical_index
+        return {
+            'products': int(products.df.memory_usage(deep=True).sum()),
+            'product_indexes': int(
+                products.ratings.nbytes + products.prices.nbytes
+                + products.category_index.by_rating.nbytes * 2
+                + lexical.doc_ids.nbytes + lexical.tfs.nbytes + lexical.offsets.nbytes
+                + (products.neighbors.ids.nbytes + products.neighbors.scores.nbytes
+                   if products.neighbors is not None else 0)
+            ),
+            'orders': int(orders.df.memory_usage(deep=True).sum()),
+            'order_indexes': int(
+                orders.customer_index.rows.nbytes + orders.customer_index.customers.nbytes
+                + orders.customer_index.offsets.nbytes
+                + sum(rows.nbytes for rows in orders.priority_index.by_priority.values())
+            )
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot version, row counts, load timings in seconds and memory footprint in bytes"""
+        return {
+            'version': self.version,
+            'created_at': self.created_at,
+            'reused': list(self.reused),
+            'products': len(self.products),
+            'orders': len(self.orders),
+            'load_seconds': dict(self.timings),
+            'memory_bytes': self.memory_usage()
+        }
+
+
+_catalog: Optional[DataCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(settings: Optional[Settings] = None) -> DataCatalog:
+    """Get or load the process-wide data catalog (settings are only used for the first load)"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = DataCatalog.from_settings(settings or Settings())
+    return _catalog
+
+
+def reload_catalog(settings: Optional[Settings] = None, force: bool = False) -> Optional[DataCatalog]:
+    """
+    Build the next catalog snapshot from the data files, without swapping it in
+
+    Only datasets whose files changed are reloaded; the rest are shared
+    with the current snapshot.
+
+    Args:
+        settings: Settings to read file locations from
+        force: Reload every dataset even if its files are unchanged
+
+    Returns:
+        The new snapshot, or None if nothing changed
+    """
+    settings = settings or Settings()
+    current = get_catalog(settings)
+    if not force and not current.changed(settings):
+        return None
+    return DataCatalog.from_settings(settings, previous=current, reuse=not force)
+
+
+def swap_catalog(catalog: DataCatalog) -> None:
+    """Make catalog the process-wide snapshot; requests already running keep the one they hold"""
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
@@ -0,0 +1,110 @@
+from typing import Sequence
+
+import pandas as pd
+
+# Matches values that carry no text, such as "", "nan", "[]" or "['[]']"
+EMPTY_TEXT_PATTERN = r"^(?:nan|[\[\]'\"\s,]*)$"
+
+
+def as_text(values: pd.Series) -> pd.Series:
+    """A column as strings, with missing values as ''"""
+    # Fill before converting, which would turn missing values into 'nan'.
+    # Only text columns can hold '' as they are.
+    if isinstance(values.dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(values.dtype):
+        values = values.astype(object)
+    return values.fillna('').astype(str)
+
+
+def is_empty_text(values: pd.Series) -> pd.Series:
+    """
+    Mark values that carry no text
+
+    Args:
+        values: Column of any type
+
+    Returns:
+        Boolean Series, True where the value is missing, blank, "nan" or an
+        empty list literal
+    """
+    return as_text(values).str.strip().str.lower().str.fullmatch(EMPTY_TEXT_PATTERN)
+
+
+def fill_empty_text(df: pd.DataFrame, column: str, fallbacks: Sequence[str]) -> pd.DataFrame:
+    """
+    Fill empty values of a text column from the first fallback column with text
+
+    Args:
+        df: DataFrame to update in place
+        column: Column to fill
+        fallbacks: Columns tried in order; absent ones are skipped
+
+    Returns:
+        The same DataFrame
+    """
+    missing = is_empty_text(df[column])
+    for col in fallbacks:
+        if not missing.any():
+            break
+        if col in df.columns:
+            usable = missing & ~is_empty_text(df[col])
+            df.loc[usable, column] = as_text(df.loc[usable, col])
+            missing &= ~usable
+    return df
+
+
+def join_text(df: pd.DataFrame, columns: Sequence[str], sep: str = ' ') -> pd.Series:
+    """
+    Concatenate text columns row by row
+
+    Args:
+        df: Source DataFrame
+        columns: Columns to join in order; absent ones are skipped
+        sep: Separator between column values
+
+    Returns:
+        String Series, '' for rows when no column is present and missing
+        values joined as ''
+    """
+    fields = [as_text(df[col]) for col in columns if col in df.columns]
+    if not fields:
+        return pd.Series([''] * len(df), index=df.index, dtype=str)
+    return fields[0].str.cat(fields[1:], sep=sep, na_rep='')
+
+
+def list_text(values: pd.Series, sep: str = '|') -> pd.Series:
+    """
+    Split delimited values into lists, written as the text a CSV file holds
+
+    Lists are kept as text ("['a', 'b']") so Parquet and CSV store the
+    same values and API responses can serialize them.
+
+    Args:
+        values: Column of delimited text
+        sep: Delimiter between items
+
+    Returns:
+        String Series, '[]' where the value is missing
+    """
+    return as_text(values).str.split(sep).map(str).where(values.notna(), '[]')
+
+
+def fill_missing_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace missing values in text columns with '' in place
+
+    Numeric and datetime columns keep their NaN/NaT, so later validation
+    can still tell missing numbers apart.
+
+    Args:
+        df: DataFrame to update
+
+    Returns:
+        The same DataFrame
+    """
+    for col in df.columns:
+        values = df[col]
+        if (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values)
+                or isinstance(values.dtype, pd.CategoricalDtype) or not values.hasnans):
+            continue
+        df[col] = values.fillna('')
+    return df
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Optional
+from .storage import preferred_path
 
 class Settings(BaseSettings):
     """Application settings"""
@@ -14,18 +16,83 @@ class Settings(BaseSettings):
     RAW_DATA_DIR: Path = DATA_DIR / "raw"
     PROCESSED_DATA_DIR: Path = DATA_DIR / "processed"
 
-    # Use processed data if available, otherwise use raw data
+    # Use processed data if available (columnar Parquet first, then CSV),
+    # otherwise use raw data
     PRODUCT_DATA_PATH: Path = (
-        PROCESSED_DATA_DIR / "processed_products.csv"
-        if (PROCESSED_DATA_DIR / "processed_products.csv").exists()
+        preferred_path(PROCESSED_DATA_DIR / "processed_products.csv")
+        if preferred_path(PROCESSED_DATA_DIR / "processed_products.csv").exists()
         else RAW_DATA_DIR / "Product_Information_Dataset.csv"
     )
     ORDER_DATA_PATH: Path = (
-        PROCESSED_DATA_DIR / "processed_orders.csv"
-        if (PROCESSED_DATA_DIR / "processed_orders.csv").exists()
+        preferred_path(PROCESSED_DATA_DIR / "processed_orders.csv")
+        if preferred_path(PROCESSED_DATA_DIR / "processed_orders.csv").exists()
         else RAW_DATA_DIR / "Order_Data_Dataset.csv"
     )
 
+    # Versioned, memory-mapped product embeddings (validated against the product data on load)
+    EMBEDDING_STORE_DIR: Path = PROCESSED_DATA_DIR / "embeddings"
+
+    # Vector index built by preprocess_data.py; exact search is used if missing.
+    # VECTOR_INDEX_NPROBE trades recall for latency on IVF indexes.
+    VECTOR_INDEX_PATH: Path = PROCESSED_DATA_DIR / "product_index.npz"
+    VECTOR_INDEX_NPROBE: int = 8
+    # Quantized in-memory copy of the product embeddings ("none", "float16"
+    # or "int8") for first-stage scoring; the best k * RESCORE rows are then
+    # rescored exactly against the float32 store
+    VECTOR_QUANTIZATION: str = "none"
+    VECTOR_RESCORE: int = 4
+
+    # BM25 index for /products/search, built by preprocess_data.py
+    LEXICAL_INDEX_PATH: Path = PROCESSED_DATA_DIR / "product_lexical_index.npz"
+
+    # Precomputed nearest-neighbour table for /products/recommendations,
+    # built by preprocess_data.py; category ranking is used if missing
+    NEIGHBOR_TABLE_PATH: Path = PROCESSED_DATA_DIR / "product_neighbors.npz"
+
+    # Chat product retrieval: "semantic" (vector index) or "hybrid" (BM25 and
+    # vector results fused with "rrf" or "weighted" scores). Each retriever
+    # contributes HYBRID_CANDIDATES rows to the fusion.
+    CHAT_RETRIEVAL_MODE: str = "semantic"
+    HYBRID_FUSION: str = "rrf"
+    HYBRID_CANDIDATES: int = 50
+
+    # Query embedding cache (in-process LRU, plus an optional SQLite tier
+    # that survives restarts). TTL is in seconds.
+    QUERY_CACHE_SIZE: int = 1024
+    QUERY_CACHE_TTL: Optional[float] = 3600
+    QUERY_CACHE_PATH: Optional[Path] = None
+
+    # Micro-batching of concurrent query encodes: wait up to MAX_WAIT_MS
+    # for up to MAX_SIZE queries and encode them in one forward pass
+    QUERY_BATCHING: bool = True
+    QUERY_BATCH_MAX_SIZE: int = 32
+    QUERY_BATCH_MAX_WAIT_MS: float = 2.0
+
+    # Rendered /chat/query responses, keyed on parsed intent and filters
+    RESPONSE_CACHE_SIZE: int = 4096
+    RESPONSE_CACHE_TTL: Optional[float] = 600
+
+    # Chat inference pool ("thread" or "process"). Requests beyond
+    # INFERENCE_WORKERS + INFERENCE_MAX_QUEUE get a 503; TIMEOUT is in seconds.
+    INFERENCE_EXECUTOR: str = "thread"
+    INFERENCE_WORKERS: int = 4
+    INFERENCE_MAX_QUEUE: int = 32
+    INFERENCE_TIMEOUT: float = 30.0
+
+    # Hot reload of product and order data: every DATA_RELOAD_INTERVAL
+    # seconds (0 disables polling) changed data files are loaded into a new
+    # snapshot once they stop changing, then swapped in. A process inference
+    # pool is restarted so its workers load the new snapshot.
+    DATA_RELOAD_INTERVAL: float = 0
+    # POST /catalog/reload reloads the worker that receives it and writes
+    # RELOAD_REQUEST_PATH, which every API worker polls every
+    # RELOAD_REQUEST_POLL_INTERVAL seconds (0 disables polling). The
+    # endpoint requires an X-Admin-Token header equal to ADMIN_TOKEN and is
+    # disabled while ADMIN_TOKEN is unset.
+    RELOAD_REQUEST_PATH: Path = PROCESSED_DATA_DIR / "reload_request.json"
+    RELOAD_REQUEST_POLL_INTERVAL: float = 1.0
+    ADMIN_TOKEN: Optional[str] = None
+
     # Model Settings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
     MODEL_DIR: Path = Path(__file__).parent.parent.parent / "models"  # backend/models
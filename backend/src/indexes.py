@@ -0,0 +1,233 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .rag.cache import LRUCache
+
+
+def _first_positions(keys: pd.Series) -> Dict[Any, int]:
+    """Map each distinct key to the position of its first row"""
+    first = ~keys.duplicated(keep='first').to_numpy()
+    return dict(zip(keys.to_numpy()[first].tolist(), np.flatnonzero(first).tolist()))
+
+class ProductIdIndex:
+    """
+    Maps product identifiers to row positions
+
+    Lookups follow the same precedence as a scan would: Product_ID as a
+    string (ASIN), then Product_ID as a number, then parent_asin. The first
+    matching row wins.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.by_string: Dict[str, int] = {}
+        self.by_number: Dict[Any, int] = {}
+        self.by_parent_asin: Dict[str, int] = {}
+        # Product_ID of every row as a string, for excluding a product from row lists
+        self.row_ids = np.full(len(df), '', dtype=object)
+
+        if 'Product_ID' in df.columns:
+            product_ids = df['Product_ID']
+            self.row_ids = product_ids.astype(str).to_numpy(dtype=object)
+            self.by_string = _first_positions(product_ids.astype(str))
+            if pd.api.types.is_numeric_dtype(product_ids):
+                self.by_number = _first_positions(product_ids)
+
+        if 'parent_asin' in df.columns:
+            self.by_parent_asin = _first_positions(df['parent_asin'].astype(str))
+
+    def lookup(self, product_id: str) -> Optional[int]:
+        """
+        Find the row position of a product
+
+        Args:
+            product_id: ASIN, numeric ID or parent ASIN
+
+        Returns:
+            Row position, or None if not found
+        """
+        product_id = str(product_id)
+        position = self.by_string.get(product_id)
+        if position is not None:
+            return position
+
+        if self.by_number:
+            try:
+                position = self.by_number.get(int(product_id))
+            except (ValueError, TypeError):
+                position = None
+            if position is not None:
+                return position
+
+        return self.by_parent_asin.get(product_id)
+
+
+class CategoryIndex:
+    """
+    Product rows per category, pre-sorted by Rating (highest first)
+
+    Rows without a numeric rating sort last. Category lookups are
+    case-insensitive substring matches, like str.contains: a query matching
+    several categories merges their rows back into rating order, and the
+    merged result is memoized per query.
+    """
+
+    def __init__(self, categories: pd.Series, ratings: np.ndarray, cache_size: int = 1024):
+        """
+        Args:
+            categories: Category of each product row
+            ratings: Numeric rating of each row, NaN where unknown
+            cache_size: Number of merged substring lookups kept
+        """
+        self.ratings = ratings
+        # Stable, so equally rated rows keep their file order; NaN sorts last
+        self.by_rating = np.argsort(-ratings, kind='stable').astype(np.int32)
+        self.rank = np.empty(len(ratings), dtype=np.int32)
+        self.rank[self.by_rating] = np.arange(len(ratings), dtype=np.int32)
+
+        codes, names = pd.factorize(categories.astype(str).to_numpy()[self.by_rating])
+        grouped = np.argsort(codes, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(names)))])
+        self.by_category: Dict[str, np.ndarray] = {
+            name: self.by_rating[grouped[offsets[i]:offsets[i + 1]]]
+            for i, name in enumerate(names.tolist())
+        }
+        self.names: List[str] = sorted(name for name in self.by_category if name)
+        self._normalized = [(name.lower(), name) for name in self.by_category]
+        self._substring_cache = LRUCache(maxsize=cache_size)
+
+    def rows(self, category: Optional[str] = None) -> np.ndarray:
+        """
+        Rows in a category, highest rated first
+
+        Args:
+            category: Case-insensitive substring of the category name, None for all rows
+
+        Returns:
+            Row positions (empty if no category matches)
+        """
+        if not category:
+            return self.by_rating
+        key = category.lower()
+        rows = self._substring_cache.get(key)
+        if rows is None:
+            matches = [self.by_category[name] for lowered, name in self._normalized if key in lowered]
+            if not matches:
+                rows = np.empty(0, dtype=np.int32)
+            elif len(matches) == 1:
+                rows = matches[0]
+            else:
+                rows = np.concatenate(matches)
+                rows = rows[np.argsort(self.rank[rows], kind='stable')]
+            self._substring_cache.set(key, rows)
+        return rows
+
+    def exact(self, category: str) -> np.ndarray:
+        """Rows whose category equals category exactly, highest rated first"""
+        return self.by_category.get(str(category), np.empty(0, dtype=np.int32))
+
+    def top(self, rows: np.ndarray, limit: int, min_rating: Optional[float] = None) -> np.ndarray:
+        """
+        The first limit rows of a rating-sorted row list with at least min_rating
+
+        Because rows are sorted, only the first limit rows are ever examined.
+        """
+        head = rows[:limit]
+        if min_rating is not None:
+            head = head[self.ratings[head] >= min_rating]
+        return head
+
+
+def _recency_keys(times: Optional[pd.Series], size: int) -> np.ndarray:
+    """Sort keys putting the newest time first and missing times last"""
+    if times is None:
+        return np.zeros(size, dtype=np.int64)
+    parsed = pd.to_datetime(times, errors='coerce')
+    nanoseconds = parsed.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return np.where(parsed.isna().to_numpy(), np.iinfo(np.int64).max, -nanoseconds)
+
+
+class CustomerOrderIndex:
+    """
+    Order rows grouped by customer, newest first
+
+    Rows are sorted once by (Customer_Id, Order_DateTime descending); each
+    customer's orders are then the slice rows[offsets[i]:offsets[i + 1]] for
+    the customer's position i in the sorted customer array, found by binary
+    search. Orders with equal times keep their original order.
+    """
+
+    def __init__(self, customer_ids: pd.Series, order_times: Optional[pd.Series] = None):
+        """
+        Args:
+            customer_ids: Customer of each order row
+            order_times: Time of each order row, None to keep file order
+        """
+        keys = pd.to_numeric(customer_ids, errors='coerce').to_numpy()
+        self.rows = np.lexsort((_recency_keys(order_times, len(keys)), keys))
+        sorted_keys = keys[self.rows]
+        boundaries = sorted_keys[1:] != sorted_keys[:-1]
+        starts = np.flatnonzero(np.concatenate([[len(keys) > 0], boundaries]))
+        self.customers = sorted_keys[starts]
+        self.offsets = np.append(starts, len(keys))
+
+    def lookup(self, customer_id: Any, limit: Optional[int] = None) -> np.ndarray:
+        """
+        Row positions of a customer's orders, newest first
+
+        Args:
+            customer_id: Customer ID
+            limit: Maximum number of rows, None for all
+
+        Returns:
+            Row positions (empty if the customer has no orders)
+        """
+        i = np.searchsorted(self.customers, customer_id)
+        if i >= len(self.customers) or self.customers[i] != customer_id:
+            return np.empty(0, dtype=self.rows.dtype)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.rows[start:end]
+
+
+class PriorityOrderIndex:
+    """
+    Order rows bucketed by priority, newest first
+
+    Priorities are matched case-insensitively. Buckets are computed once
+    from the categorical codes, so a lookup is a dictionary access and a
+    slice.
+    """
+
+    def __init__(self, priorities: pd.Series, order_times: Optional[pd.Series] = None):
+        """
+        Args:
+            priorities: Priority of each order row
+            order_times: Time of each order row, None to keep file order
+        """
+        priorities = priorities.astype('category')
+        # Categories differing only in case share a bucket
+        groups, names = pd.factorize(priorities.cat.categories.astype(str).str.lower())
+        codes = priorities.cat.codes.to_numpy()
+        keys = np.where(codes >= 0, groups[codes], len(names))
+        rows = np.lexsort((_recency_keys(order_times, len(keys)), keys))
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(keys, minlength=len(names) + 1))])
+        self.by_priority: Dict[str, np.ndarray] = {
+            name: rows[offsets[i]:offsets[i + 1]] for i, name in enumerate(names.tolist())
+        }
+
+    def lookup(self, priority: str, limit: Optional[int] = None) -> np.ndarray:
+        """
+        Row positions of orders with a priority, newest first
+
+        Args:
+            priority: Priority level, any case
+            limit: Maximum number of rows, None for all
+
+        Returns:
+            Row positions (empty if no order has the priority)
+        """
+        rows = self.by_priority.get(str(priority).lower(), np.empty(0, dtype=np.int64))
+        return rows if limit is None else rows[:limit]
@@ -3,23 +3,123 @@ import numpy as np
 import re
 import os
 import ast
+import copy
+import time
+import hashlib
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+import threading
+from .embedding_store import (
+    StoredEmbeddings,
+    build_embedding_texts,
+    compute_fingerprint,
+    content_hashes,
+    file_digest,
+    open_embedding_store,
+    product_row_ids,
+    store_lock,
+    update_embeddings,
+    write_embedding_store,
+)
+from .vector_index import (
+    QUANTIZATION_MODES,
+    FlatIndex,
+    VectorIndex,
+    l2_normalize,
+    load_index,
+    update_index,
+)
+from .hybrid import HybridRetriever
+from .cache import QueryEmbeddingCache, ResponseCache
+from .batching import MicroBatcher
+from .utils import preprocess_text
+from ..catalog import DataCatalog, get_catalog
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columns the assistant reads when it loads its own catalog from Parquet
+PRODUCT_COLUMNS = (
+    'Product_ID', 'parent_asin', 'Product_Title', 'Description', 'Category',
+    'Rating', 'Price', 'Features', 'feature_list'
+)
+ORDER_COLUMNS = (
+    'Order_ID', 'Order_DateTime', 'Customer_Id', 'Product', 'Sales',
+    'Shipping_Cost', 'Order_Priority'
+)
+
 class ECommerceRAG:
     def __init__(self, 
                  product_dataset_path: str, 
                  order_dataset_path: str,
-                 model_name: str = "all-MiniLM-L6-v2"):
-        """Initialize RAG system"""
-        self.product_df = pd.read_csv(product_dataset_path)
-        self.order_df = pd.read_csv(order_dataset_path)
+                 model_name: str = "all-MiniLM-L6-v2",
+                 embedding_store_dir: Optional[str] = None,
+                 vector_index_path: Optional[str] = None,
+                 nprobe: int = 8,
+                 quantization: str = "none",
+                 rescore: int = 4,
+                 query_cache_size: int = 1024,
+                 query_cache_ttl: Optional[float] = 3600,
+                 query_cache_path: Optional[str] = None,
+                 response_cache_size: int = 4096,
+                 response_cache_ttl: Optional[float] = 600,
+                 query_batching: bool = True,
+                 query_batch_max_size: int = 32,
+                 query_batch_max_wait_ms: float = 2.0,
+                 lexical_index_path: Optional[str] = None,
+                 retrieval_mode: str = "semantic",
+                 hybrid_fusion: str = "rrf",
+                 hybrid_candidates: int = 50,
+                 catalog: Optional[DataCatalog] = None):
+        """Initialize RAG system; product and order data come from catalog if given"""
+        if retrieval_mode not in ("semantic", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode '{retrieval_mode}', use 'semantic' or 'hybrid'")
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{quantization}', use one of {QUANTIZATION_MODES}")
+        start = time.perf_counter()
+        self.model_name = model_name
+        self.product_dataset_path = Path(product_dataset_path)
+        # Default to a store next to the product dataset
+        self.embedding_store_dir = (
+            Path(embedding_store_dir) if embedding_store_dir
+            else self.product_dataset_path.parent / "embeddings"
+        )
+        self.vector_index_path = (
+            Path(vector_index_path) if vector_index_path
+            else self.product_dataset_path.parent / "product_index.npz"
+        )
+        self.nprobe = nprobe
+        self.quantization = quantization
+        self.rescore = rescore
+        self.lexical_index_path = (
+            Path(lexical_index_path) if lexical_index_path
+            else self.product_dataset_path.parent / "product_lexical_index.npz"
+        )
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_fusion = hybrid_fusion
+        self.hybrid_candidates = hybrid_candidates
+        self._hybrid_retriever: Optional[HybridRetriever] = None
+        self._hybrid_lock = threading.Lock()
+        self.order_dataset_path = Path(order_dataset_path)
+
+        # Normalized, indexed data, shared with the API routers when passed in
+        self.catalog = catalog or DataCatalog(
+            self.product_dataset_path,
+            self.order_dataset_path,
+            lexical_index_path=self.lexical_index_path,
+            product_columns=PRODUCT_COLUMNS,
+            order_columns=ORDER_COLUMNS
+        )
+        self.product_df = self.catalog.products.df
+        self.order_df = self.catalog.orders.df
+        self.product_ratings = self.catalog.products.ratings
+        self.product_prices = self.catalog.products.prices
+        logger.info(f"Loaded datasets in {time.perf_counter() - start:.2f}s")
         
+        stage_start = time.perf_counter()
+
         # 設置本地模型路徑（backend/models/model_name）
         base_dir = Path(__file__).parent.parent.parent  # backend 目錄
         local_model_dir = base_dir / "models" / model_name
@@ -38,85 +138,277 @@ class ECommerceRAG:
             logger.info(f"Loading model from local directory: {local_model_dir}")
             # 從本地目錄加載
             self.model = SentenceTransformer(str(local_model_dir))
+        logger.info(f"Loaded model in {time.perf_counter() - stage_start:.2f}s")
+        # Concurrent cache misses share one batched forward pass
+        self.query_batcher = (
+            MicroBatcher(
+                self._encode_batch,
+                max_batch_size=query_batch_max_size,
+                max_wait_ms=query_batch_max_wait_ms
+            )
+            if query_batching else None
+        )
+        # Query embeddings are normalized once, before they are cached; the
+        # disk tier key keeps entries from before normalization out
+        self.query_cache = QueryEmbeddingCache(
+            self.query_batcher.encode if self.query_batcher else self._encode_query,
+            f"{model_name}:l2",
+            maxsize=query_cache_size,
+            ttl=query_cache_ttl,
+            disk_path=query_cache_path,
+            encode_batch=self._encode_batch
+        )
         
-        self._preprocess_data()
+        stage_start = time.perf_counter()
         self._create_product_embeddings()
+        logger.info(f"Prepared product embeddings in {time.perf_counter() - stage_start:.2f}s")
+
+        stage_start = time.perf_counter()
+        self.vector_index = self._load_vector_index()
+        logger.info(f"Loaded {self.vector_index.kind} vector index in {time.perf_counter() - stage_start:.2f}s")
+
+        # Responses are cached per data version, so new data never serves stale answers
+        self.response_cache = ResponseCache(maxsize=response_cache_size, ttl=response_cache_ttl)
+        self.data_version = self._compute_data_version()
+        self.response_cache.set_version(self.data_version)
+        logger.info(f"RAG system ready in {time.perf_counter() - start:.2f}s")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode a list of query texts in one forward pass, L2-normalized"""
+        return l2_normalize(self.model.encode(texts, batch_size=len(texts), show_progress_bar=False))
+
+    def _encode_query(self, text: str) -> np.ndarray:
+        """Encode one query text, L2-normalized"""
+        return l2_normalize(self.model.encode(text, show_progress_bar=False))
+
+    @classmethod
+    def from_settings(cls, settings) -> "ECommerceRAG":
+        """Create a RAG system configured from application Settings, on the shared data catalog"""
+        # The catalog may serve the Parquet copy of a dataset; embeddings are
+        # fingerprinted against the file it actually loaded
+        catalog = get_catalog(settings)
+        return cls(
+            product_dataset_path=str(catalog.products.path),
+            order_dataset_path=str(catalog.orders.path),
+            model_name=settings.EMBEDDING_MODEL,
+            embedding_store_dir=str(settings.EMBEDDING_STORE_DIR),
+            vector_index_path=str(settings.VECTOR_INDEX_PATH),
+            nprobe=settings.VECTOR_INDEX_NPROBE,
+            quantization=settings.VECTOR_QUANTIZATION,
+            rescore=settings.VECTOR_RESCORE,
+            query_cache_size=settings.QUERY_CACHE_SIZE,
+            query_cache_ttl=settings.QUERY_CACHE_TTL,
+            query_cache_path=str(settings.QUERY_CACHE_PATH) if settings.QUERY_CACHE_PATH else None,
+            response_cache_size=settings.RESPONSE_CACHE_SIZE,
+            response_cache_ttl=settings.RESPONSE_CACHE_TTL,
+            query_batching=settings.QUERY_BATCHING,
+            query_batch_max_size=settings.QUERY_BATCH_MAX_SIZE,
+            query_batch_max_wait_ms=settings.QUERY_BATCH_MAX_WAIT_MS,
+            lexical_index_path=str(settings.LEXICAL_INDEX_PATH),
+            retrieval_mode=settings.CHAT_RETRIEVAL_MODE,
+            hybrid_fusion=settings.HYBRID_FUSION,
+            hybrid_candidates=settings.HYBRID_CANDIDATES,
+            catalog=catalog
+        )
     
-    def _preprocess_data(self):
-        """Preprocess datasets"""
-        # Fill NaN values by dtype to avoid warnings
-        for col in self.product_df.columns:
-            if self.product_df[col].dtype == 'object':
-                self.product_df[col] = self.product_df[col].fillna('')
-
-        for col in self.order_df.columns:
-            if self.order_df[col].dtype == 'object':
-                self.order_df[col] = self.order_df[col].fillna('')
-
-        # Handle both raw and processed product data formats
-        if 'Product_Title' not in self.product_df.columns:
-            # Raw format: map column names
-            column_mapping = {
-                'title': 'Product_Title',
-                'average_rating': 'Rating',
-                'description': 'Description',
-                'features': 'Features',
-                'price': 'Price',
-                'parent_asin': 'Product_ID'
-            }
-            for old_col, new_col in column_mapping.items():
-                if old_col in self.product_df.columns:
-                    self.product_df[new_col] = self.product_df[old_col]
-
-        # Fill missing/empty description with features
-        if 'Features' in self.product_df.columns:
-            def fill_description(row):
-                desc = str(row.get('Description', ''))
-                # Check if description is empty, NaN, or empty list string
-                if not desc or desc.lower() == 'nan' or desc.strip() == '[]':
-                    features = str(row.get('Features', ''))
-                    if features and features.lower() != 'nan' and features.strip() != '[]':
-                        return features
-                return desc
-            
-            self.product_df['Description'] = self.product_df.apply(fill_description, axis=1)
-
-        # Handle both raw and processed order data formats
-        if 'Order_DateTime' not in self.order_df.columns:
-            # Raw format: combine Order_Date and Time
-            if 'Order_Date' in self.order_df.columns and 'Time' in self.order_df.columns:
-                self.order_df['Order_DateTime'] = pd.to_datetime(
-                    self.order_df['Order_Date'].astype(str) + ' ' +
-                    self.order_df['Time'].astype(str)
+    def _create_product_embeddings(self):
+        """
+        Map product embeddings from the store; if it is stale, encode only
+        the products whose text changed and store a new version
+
+        The encode and write hold the store lock, so when several processes
+        find the store stale at once only one encodes; the others wait and
+        map the version it wrote.
+        """
+        fingerprint = compute_fingerprint(self.product_dataset_path, self.model_name)
+        store = open_embedding_store(
+            self.embedding_store_dir,
+            fingerprint,
+            expected_rows=len(self.product_df)
+        )
+        if store is not None:
+            logger.info(f"Mapped product embeddings from {store.path}")
+        else:
+            with store_lock(self.embedding_store_dir):
+                # Another process may have written it while this one waited
+                store = open_embedding_store(
+                    self.embedding_store_dir,
+                    fingerprint,
+                    expected_rows=len(self.product_df)
                 )
-            else:
-                logger.warning("Order data missing datetime information")
-                return
+                if store is not None:
+                    logger.info(f"Mapped product embeddings written by another process from {store.path}")
+                else:
+                    store = self._write_product_embeddings(fingerprint)
+                    if store is None:
+                        return
+
+        self.embedding_store = store
+        self.product_embeddings = store.embeddings
+
+    def _write_product_embeddings(self, fingerprint: str) -> Optional[StoredEmbeddings]:
+        """
+        Encode the changed products and store a new version (store lock held)
+
+        Returns:
+            The mapped new version, or None if it could not be stored or
+            mapped, in which case the in-memory matrix is used instead
+        """
+        texts = build_embedding_texts(self.product_df)
+        hashes = content_hashes(texts, self.model_name)
+        # Rows of the previous version are reused wherever the text is unchanged
+        previous = open_embedding_store(self.embedding_store_dir)
+        embeddings, previous_rows = update_embeddings(texts, hashes, previous, self.model.encode)
+        logger.info(
+            f"Encoded {int((previous_rows < 0).sum())} of {len(self.product_df)} products, "
+            f"reused the rest"
+        )
+        try:
+            path = write_embedding_store(
+                self.embedding_store_dir,
+                embeddings,
+                product_row_ids(self.product_df),
+                fingerprint,
+                self.model_name,
+                hashes=hashes
+            )
+            logger.info(f"Saved product embeddings to {path}")
+        except OSError as e:
+            logger.warning(f"Could not save embedding store: {str(e)}")
+            store = None
         else:
-            # Processed format: just convert to datetime
-            self.order_df['Order_DateTime'] = pd.to_datetime(self.order_df['Order_DateTime'])
+            # Reopen the written version so this process shares its pages too
+            store = open_embedding_store(self.embedding_store_dir, fingerprint)
+            if store is None:
+                logger.warning("Written embedding store version could not be mapped, using it from memory")
+        if store is None:
+            self.embedding_store = None
+            self.product_embeddings = embeddings
+            return None
+        if previous is not None:
+            self._update_vector_index(store, previous, previous_rows)
+        return store
 
-        self.order_df = self.order_df.sort_values('Order_DateTime', ascending=False)
-    
-    def _create_product_embeddings(self):
-        """Create product embeddings"""
-        texts = self.product_df.apply(
-            lambda x: f"{x['Product_Title']} {x['Description']}", 
-            axis=1
-        ).tolist()
-        self.product_embeddings = self.model.encode(texts)
+    def _update_vector_index(self, store: StoredEmbeddings, previous: StoredEmbeddings,
+                             previous_rows: np.ndarray):
+        """Patch the persisted vector index built over the previous store version"""
+        try:
+            index = update_index(
+                self.vector_index_path,
+                store.embeddings,
+                store.metadata['fingerprint'],
+                previous.embeddings,
+                previous.metadata['fingerprint'],
+                previous_rows
+            )
+        except OSError as e:
+            logger.warning(f"Could not update vector index: {str(e)}")
+            return
+        if index is not None:
+            logger.info(f"Updated {index.kind} vector index for the changed products")
+
+    def _compute_data_version(self) -> str:
+        """Identify the product, order and embedding data behind responses"""
+        product_version = (
+            self.embedding_store.metadata['fingerprint'] if self.embedding_store is not None
+            else compute_fingerprint(self.product_dataset_path, self.model_name)
+        )
+        order_version = file_digest(self.order_dataset_path)
+        return hashlib.sha256(f"{product_version}:{order_version}".encode('utf-8')).hexdigest()[:16]
+
+    def _load_vector_index(self) -> VectorIndex:
+        """
+        Load the persisted vector index, falling back to exact search, and
+        quantize it if configured
+        """
+        index = None
+        if self.embedding_store is not None:
+            index = load_index(
+                self.vector_index_path,
+                self.product_embeddings,
+                self.embedding_store.metadata['fingerprint'],
+                nprobe=self.nprobe
+            )
+        if index is None:
+            logger.info("No usable vector index found, using exact search")
+            index = FlatIndex(self.product_embeddings)
+        if self.quantization != "none":
+            index.quantize(self.quantization, self.rescore)
+            full_bytes = max(self.product_embeddings.size * 4, 1)
+            logger.info(
+                f"Scoring products on {self.quantization} embeddings "
+                f"({index.quantized.nbytes / 1e6:.1f} MB, {1 - index.quantized.nbytes / full_bytes:.0%} "
+                f"less than float32), rescoring the top {self.rescore}x"
+            )
+        return index
+
+    def reloaded(self, catalog: DataCatalog) -> "ECommerceRAG":
+        """
+        A copy of this assistant serving a newer catalog snapshot
+
+        The model and query embedding cache are shared. Product embeddings
+        and the vector index are reopened only if the snapshot's products
+        changed, and responses get a new cache for the new data version.
+        This assistant is left as it is, so queries running on it finish
+        on the old data.
+
+        Args:
+            catalog: The new snapshot
+
+        Returns:
+            The new assistant
+        """
+        start = time.perf_counter()
+        assistant = copy.copy(self)
+        assistant.catalog = catalog
+        assistant.product_df = catalog.products.df
+        assistant.order_df = catalog.orders.df
+        assistant.product_ratings = catalog.products.ratings
+        assistant.product_prices = catalog.products.prices
+        assistant.order_dataset_path = catalog.orders.path
+
+        if catalog.products is not self.catalog.products:
+            assistant.product_dataset_path = catalog.products.path
+            assistant._create_product_embeddings()
+            assistant.vector_index = assistant._load_vector_index()
+            assistant._hybrid_retriever = None
+            assistant._hybrid_lock = threading.Lock()
+
+        assistant.response_cache = ResponseCache(
+            maxsize=self.response_cache.maxsize,
+            ttl=self.response_cache.ttl
+        )
+        assistant.data_version = assistant._compute_data_version()
+        assistant.response_cache.set_version(assistant.data_version)
+        logger.info(
+            f"Moved RAG system to catalog v{catalog.version} in {time.perf_counter() - start:.2f}s"
+        )
+        return assistant
+
+    @property
+    def hybrid_retriever(self) -> HybridRetriever:
+        """Lexical + vector retriever over the catalog's BM25 index, created on first use"""
+        if self._hybrid_retriever is None:
+            with self._hybrid_lock:
+                if self._hybrid_retriever is None:
+                    self._hybrid_retriever = HybridRetriever(
+                        self.catalog.products.lexical_index,
+                        self.vector_index,
+                        self.query_cache.encode,
+                        fusion=self.hybrid_fusion,
+                        candidates=self.hybrid_candidates
+                    )
+        return self._hybrid_retriever
     
-    def get_customer_orders(self, customer_id: int) -> List[Dict[str, Any]]:
-        """Get orders for a specific customer"""
-        customer_orders = self.order_df[self.order_df['Customer_Id'] == customer_id]
-        return customer_orders.sort_values('Order_DateTime', ascending=False).to_dict('records')
+    def get_customer_orders(self, customer_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get a customer's orders, newest first"""
+        rows = self.catalog.orders.customer_index.lookup(customer_id, limit)
+        return self.order_df.iloc[rows].to_dict('records')
     
     def get_high_priority_orders(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get high priority orders"""
-        high_priority = self.order_df[
-            self.order_df['Order_Priority'].str.lower() == 'high'
-        ]
-        return high_priority.sort_values('Order_DateTime', ascending=False).head(limit).to_dict('records')
+        """Get the most recent high priority orders"""
+        rows = self.catalog.orders.priority_index.lookup('high', limit)
+        return self.order_df.iloc[rows].to_dict('records')
     
     def format_single_order(self, order: Dict[str, Any]) -> str:
         """Format single order details with HTML"""
@@ -252,33 +544,71 @@ class ECommerceRAG:
         response += '<p><em>Let me know if you\'d like more details!</em></p>'
         return response
     
-    def semantic_search(self, query: str, min_rating: Optional[float] = None, max_price: Optional[float] = None) -> List[Dict[str, Any]]:
+    def _filter_mask(self, min_rating: Optional[float], max_price: Optional[float],
+                     category: Optional[str] = None) -> Optional[np.ndarray]:
+        """Build a boolean row mask for the rating, price and category filters"""
+        mask = None
+        if category:
+            mask = self.catalog.products.category_mask(category)
+        if min_rating is not None:
+            rating_mask = self.product_ratings >= min_rating
+            mask = rating_mask if mask is None else mask & rating_mask
+        if max_price is not None:
+            price_mask = self.product_prices <= max_price
+            mask = price_mask if mask is None else mask & price_mask
+        return mask
+
+    def retrieve(self, query: str, top_k: int = 5, min_rating: Optional[float] = None,
+                 max_price: Optional[float] = None, category: Optional[str] = None,
+                 mode: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the best product rows for a query
+
+        Args:
+            mode: "semantic" or "hybrid", defaults to the configured retrieval mode
+
+        Returns:
+            Tuple of (row positions, scores), best first
+        """
+        # Filters are pushed into the retrievers so they return top_k allowed rows
+        mask = self._filter_mask(min_rating, max_price, category)
+        if (mode or self.retrieval_mode) == "hybrid":
+            return self.hybrid_retriever.search(query, top_k, mask=mask)
+        query_embedding = self.query_cache.encode(query)
+        return self.vector_index.search(query_embedding, top_k, mask=mask)
+
+    def semantic_search(self, query: str, min_rating: Optional[float] = None, max_price: Optional[float] = None,
+                        top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Perform semantic search with rating and price filters
         """
-        query_embedding = self.model.encode(query)
-        similarities = np.dot(self.product_embeddings, query_embedding)
-        
-        # Create DataFrame with similarities
-        results_df = self.product_df.copy()
-        results_df['similarity'] = similarities
-        
-        # Apply rating filter if specified
-        if min_rating is not None:
-            results_df = results_df[results_df['Rating'] >= min_rating]
-        
-        # Apply price filter if specified
-        if max_price is not None:
-            results_df = results_df[results_df['Price'] <= max_price]
+        ids, scores = self.retrieve(query, top_k, min_rating, max_price, mode="semantic")
         
-        # Sort by similarity and get top results
-        results_df = results_df.sort_values('similarity', ascending=False).head(5)
+        # Materialize only the winning rows
+        results = self.product_df.iloc[ids].to_dict('records')
+        for result, score in zip(results, scores):
+            result['similarity'] = float(score)
         
-        return results_df.to_dict('records')
+        return results
 
-    def process_query(self, query: str, customer_id: Optional[int] = None) -> str:
-        """Process user query with improved filtering"""
-        original_query = query
+    def hybrid_search(self, query: str, min_rating: Optional[float] = None, max_price: Optional[float] = None,
+                      top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Perform fused lexical and semantic search with rating and price filters
+        """
+        ids, scores = self.retrieve(query, top_k, min_rating, max_price, mode="hybrid")
+        results = self.product_df.iloc[ids].to_dict('records')
+        for result, score in zip(results, scores):
+            result['score'] = float(score)
+        return results
+
+    def parse_query(self, query: str, customer_id: Optional[int] = None) -> Tuple[str, Tuple[Any, ...]]:
+        """
+        Map a user query to an intent and the parameters its answer depends on
+
+        Returns:
+            Tuple of (intent name, parameters)
+        """
         query_lower = query.lower()
         
         # Extract rating requirement if present
@@ -324,22 +654,38 @@ class ECommerceRAG:
                         limit = extracted_limit
                 except ValueError:
                     pass
-            
-            orders = self.get_high_priority_orders(limit)
-            return self.format_high_priority_orders(orders)
+            return 'high_priority_orders', (limit,)
         
         # Handle regular order queries
         if any(keyword in query_lower for keyword in ['order', 'orders', 'purchase', 'bought']):
             if not customer_id:
-                return "<p>Could you please provide your Customer ID?</p>"
-            
-            orders = self.get_customer_orders(customer_id)
+                return 'customer_id_required', ()
+            return 'customer_orders', (customer_id,)
+        
+        # Handle product queries; the search text is normalized the same way
+        # as the query embedding cache key
+        return 'product_search', (preprocess_text(query), min_rating, max_price)
+
+    def answer(self, intent: str, params: Tuple[Any, ...]) -> str:
+        """Build the response for a parsed intent"""
+        if intent == 'high_priority_orders':
+            (limit,) = params
+            orders = self.get_high_priority_orders(limit)
+            return self.format_high_priority_orders(orders)
+
+        if intent == 'customer_id_required':
+            return "<p>Could you please provide your Customer ID?</p>"
+
+        if intent == 'customer_orders':
+            (customer_id,) = params
+            orders = self.get_customer_orders(customer_id, limit=1)
             if not orders:
                 return f"<p>No orders found for customer <strong>{customer_id}</strong></p>"
             return self.format_single_order(orders[0])
-        
-        # Handle product queries
-        products = self.semantic_search(query, min_rating=min_rating, max_price=max_price)
+
+        query, min_rating, max_price = params
+        search = self.hybrid_search if self.retrieval_mode == "hybrid" else self.semantic_search
+        products = search(query, min_rating=min_rating, max_price=max_price)
         
         # Provide feedback if filters were applied but no results
         if not products:
@@ -355,3 +701,46 @@ class ECommerceRAG:
                 return "<p>No products found matching your search. Try different keywords.</p>"
             
         return self.format_product_results(products)
+
+    def process_query(self, query: str, customer_id: Optional[int] = None) -> str:
+        """Process user query with improved filtering"""
+        intent, params = self.parse_query(query, customer_id)
+        key = (intent, params)
+        response = self.response_cache.get(key)
+        if response is None:
+            response = self.answer(intent, params)
+            self.response_cache.set(key, response)
+        return response
+
+    def process_queries(self, queries: List[Tuple[str, Optional[int]]]) -> List[str]:
+        """
+        Process many (query, customer_id) pairs, encoding all product
+        searches that miss the caches in a single batch
+        """
+        keys = [self.parse_query(query, customer_id) for query, customer_id in queries]
+        responses = [self.response_cache.get(key) for key in keys]
+
+        search_texts = [
+            params[0] for (intent, params), response in zip(keys, responses)
+            if response is None and intent == 'product_search'
+        ]
+        if search_texts:
+            self.query_cache.encode_many(search_texts)
+
+        for i, key in enumerate(keys):
+            if responses[i] is None:
+                responses[i] = self.answer(*key)
+                self.response_cache.set(key, responses[i])
+        return responses
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit ratio metrics for the query embedding and response caches"""
+        stats = {
+            'data_version': self.data_version,
+            'query_embeddings': self.query_cache.stats(),
+            'responses': self.response_cache.stats()
+        }
+        if self.query_batcher is not None:
+            stats['query_batching'] = self.query_batcher.stats()
+        stats['retrieval_mode'] = self.retrieval_mode
+        return stats
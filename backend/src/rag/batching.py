@@ -0,0 +1,120 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-text encode calls into batched forward passes
+
+    Callers block on encode(); a background thread gathers pending texts
+    until max_batch_size is reached or max_wait_ms has passed since the
+    first one arrived, encodes them together and resolves each caller's
+    future with its own row.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        """
+        Args:
+            encode_batch: Function mapping a list of texts to an (n, d) matrix
+            max_batch_size: Largest number of texts encoded in one pass
+            max_wait_ms: Longest time the first text in a batch waits for company
+        """
+        self._encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.histogram: Dict[int, int] = {}
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="query-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for encoding and return a future for its embedding"""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Encode one text, sharing a forward pass with concurrent callers"""
+        return self.submit(text).result(timeout)
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        """Block for one item, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            # Identical texts in one batch are encoded once
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = np.asarray(self._encode_batch(texts), dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Batched encode of {len(texts)} texts failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            rows = {text: embeddings[i] for i, text in enumerate(texts)}
+            for text, future in batch:
+                future.set_result(rows[text])
+            self._record(len(texts))
+
+    def _record(self, size: int) -> None:
+        """Count a batch in the power-of-two size histogram"""
+        bucket = 1 << (size - 1).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+        self.batches += 1
+        self.items += size
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch counts and a histogram of batch sizes (bucketed up to powers of two)"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'batch_size_histogram': {f"<={k}": v for k, v in sorted(self.histogram.items())}
+        }
+
+    def close(self) -> None:
+        """Stop accepting new texts; already queued texts are still encoded"""
+        self._closed = True
+
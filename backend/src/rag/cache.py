@@ -0,0 +1,265 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .utils import preprocess_text
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            maxsize: Maximum number of entries, 0 disables caching
+            ttl: Seconds an entry stays valid, None for no expiry
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+
+class ResponseCache(LRUCache):
+    """
+    LRU cache of rendered responses, keyed on parsed intent and parameters
+
+    Entries belong to one data version; switching to a new version drops
+    everything cached for the old one.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.version: Optional[str] = None
+        self.invalidations = 0
+
+    def set_version(self, version: str) -> None:
+        """Switch to a data version, clearing entries from the previous one"""
+        with self._lock:
+            if version == self.version:
+                return
+            if self.version is not None:
+                self.invalidations += 1
+            self.version = version
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats['version'] = self.version
+        stats['invalidations'] = self.invalidations
+        return stats
+
+
+class DiskEmbeddingCache:
+    """SQLite-backed embedding cache that survives restarts"""
+
+    def __init__(self, path: Union[str, Path], model_name: str, ttl: Optional[float] = None):
+        """
+        Args:
+            path: SQLite database file, shared safely between processes
+            model_name: Embeddings from other models are never returned
+            ttl: Seconds an entry stays valid, None for no expiry
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=1.0, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "model TEXT NOT NULL, query TEXT NOT NULL, created REAL NOT NULL, "
+            "embedding BLOB NOT NULL, PRIMARY KEY (model, query))"
+        )
+        self._conn.commit()
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Return the stored embedding for a normalized query, if still valid"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT created, embedding FROM query_embeddings WHERE model = ? AND query = ?",
+                    (self.model_name, query)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Query cache read failed: {str(e)}")
+            return None
+        if row is None:
+            return None
+        created, blob = row
+        if self.ttl is not None and created + self.ttl < time.time():
+            return None
+        return np.frombuffer(blob, dtype=np.float32)
+
+    def set(self, query: str, embedding: np.ndarray) -> None:
+        """Store the embedding for a normalized query"""
+        blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                    (self.model_name, query, time.time(), blob)
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            # Another worker holding the write lock is not worth failing a query over
+            logger.warning(f"Query cache write failed: {str(e)}")
+
+
+class QueryEmbeddingCache:
+    """
+    Caches query embeddings keyed on normalized query text
+
+    Lookups go to an in-process LRU first, then to the optional disk tier,
+    and only call the encoder on a miss in both.
+    """
+
+    def __init__(self, encode: Callable[[str], np.ndarray], model_name: str,
+                 maxsize: int = 1024, ttl: Optional[float] = None,
+                 disk_path: Optional[Union[str, Path]] = None,
+                 encode_batch: Optional[Callable[[List[str]], np.ndarray]] = None):
+        """
+        Args:
+            encode: Function mapping a query string to its embedding
+            model_name: Name of the model behind encode
+            maxsize: Maximum number of in-memory entries
+            ttl: Seconds an entry stays valid, None for no expiry
+            disk_path: Optional SQLite file for the persistent tier
+            encode_batch: Function mapping a list of queries to an (n, d)
+                matrix, used by encode_many
+        """
+        self._encode = encode
+        self._encode_batch = encode_batch
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk = DiskEmbeddingCache(disk_path, model_name, ttl) if disk_path else None
+        self.disk_hits = 0
+        self.encodes = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Cache key for a query"""
+        return preprocess_text(query)
+
+    def encode(self, query: str) -> np.ndarray:
+        """Return the embedding for a query, encoding it only on a cache miss"""
+        key = self.normalize(query)
+        embedding = self._lookup(key)
+        if embedding is not None:
+            return embedding
+
+        self.encodes += 1
+        return self._store(key, self._encode(key))
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        """Find a normalized query in the memory tier, then the disk tier"""
+        embedding = self.memory.get(key)
+        if embedding is None and self.disk is not None:
+            embedding = self.disk.get(key)
+            if embedding is not None:
+                self.disk_hits += 1
+                self.memory.set(key, embedding)
+        return embedding
+
+    def _store(self, key: str, embedding: np.ndarray) -> np.ndarray:
+        """Add a freshly encoded embedding to both tiers"""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        self.memory.set(key, embedding)
+        if self.disk is not None:
+            self.disk.set(key, embedding)
+        return embedding
+
+    def encode_many(self, queries: Sequence[str]) -> List[np.ndarray]:
+        """
+        Return embeddings for many queries, encoding all misses in one batch
+
+        Args:
+            queries: Query strings, may contain duplicates
+
+        Returns:
+            One embedding per query, in input order
+        """
+        keys = [self.normalize(q) for q in queries]
+        found = {}
+        for key in dict.fromkeys(keys):
+            embedding = self._lookup(key)
+            if embedding is not None:
+                found[key] = embedding
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            if self._encode_batch is not None:
+                matrix = self._encode_batch(missing)
+            else:
+                matrix = [self._encode(key) for key in missing]
+            for key, embedding in zip(missing, matrix):
+                found[key] = self._store(key, embedding)
+            self.encodes += len(missing)
+
+        return [found[key] for key in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the memory and disk tiers"""
+        stats = self.memory.stats()
+        stats['disk_hits'] = self.disk_hits
+        stats['encodes'] = self.encodes
+        return stats
@@ -0,0 +1,580 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+from ..cleaning import join_text
+from .vector_index import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+# Identifies how product rows are turned into encoder input. Bump the version
+# whenever build_embedding_texts changes so stored embeddings are invalidated.
+# v2: Description is filled from features by the shared cleaning pipeline.
+EMBEDDING_TEXT_RECIPE = "Product_Title+Description:v2"
+EMBEDDING_TEXT_COLUMNS = ('Product_Title', 'Description')
+
+# On-disk layout of a store version file:
+#   MAGIC (8 bytes) | header length (uint32 LE) | JSON header | padding |
+#   embedding matrix (row-major) | row ids (fixed-width UTF-8 bytes) |
+#   content hashes (optional, HASH_DTYPE)
+# The matrix starts on a DATA_ALIGNMENT boundary so it can be memory-mapped.
+MAGIC = b"ECEMB\x00\x01\x00"
+FORMAT_VERSION = 1
+DATA_ALIGNMENT = 64
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+KEEP_VERSIONS = 2
+SUPPORTED_DTYPES = ("float32", "float16")
+# Hex digest of each row's encoder input, model and recipe
+HASH_DTYPE = "S32"
+
+
+class StoredEmbeddings:
+    """Read-only view of one embedding store version"""
+
+    def __init__(self, path: Path, metadata: Dict[str, Any],
+                 embeddings: np.ndarray, row_ids: np.ndarray,
+                 hashes: Optional[np.ndarray] = None):
+        self.path = path
+        self.metadata = metadata
+        self.embeddings = embeddings
+        self.row_ids = row_ids
+        self.hashes = hashes
+
+    @property
+    def version(self) -> str:
+        return self.path.stem
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+
+def build_embedding_texts(df: pd.DataFrame) -> List[str]:
+    """
+    Build the texts fed to the sentence encoder for each product row
+
+    Args:
+        df: Product DataFrame with Product_Title and Description columns
+
+    Returns:
+        List of texts, one per row
+    """
+    return join_text(df, EMBEDDING_TEXT_COLUMNS).tolist()
+
+
+def product_row_ids(df: pd.DataFrame) -> List[str]:
+    """
+    Get the identifiers stored alongside each embedding row
+
+    Args:
+        df: Product DataFrame
+
+    Returns:
+        Product_ID of each row as a string, or the row position if absent
+    """
+    if 'Product_ID' in df.columns:
+        ids = df['Product_ID']
+        # Raw data can yield two Product_ID columns; the first is the ASIN
+        if isinstance(ids, pd.DataFrame):
+            ids = ids.iloc[:, 0]
+        return ids.astype(str).tolist()
+    return [str(i) for i in range(len(df))]
+
+
+def file_digest(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """
+    Calculate the SHA-256 digest of a file's contents
+
+    Args:
+        path: File to hash
+        chunk_size: Number of bytes read per iteration
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_fingerprint(
+    product_path: Union[str, Path],
+    model_name: str,
+    recipe: str = EMBEDDING_TEXT_RECIPE
+) -> str:
+    """
+    Fingerprint the inputs that determine the product embedding matrix
+
+    Args:
+        product_path: Product dataset the embeddings were computed from
+        model_name: Name of the sentence-transformers model
+        recipe: Identifier of the text recipe used to build encoder input
+
+    Returns:
+        Hex digest combining the file contents, model name and recipe
+    """
+    digest = hashlib.sha256()
+    for part in (file_digest(product_path), model_name, recipe):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def content_hashes(
+    texts: Sequence[str],
+    model_name: str,
+    recipe: str = EMBEDDING_TEXT_RECIPE
+) -> np.ndarray:
+    """
+    Hash the encoder input of each product row
+
+    Two rows with the same hash get the same embedding, so a stored row
+    can be reused for any product whose hash matches it.
+
+    Args:
+        texts: Encoder input per row, from build_embedding_texts
+        model_name: Name of the sentence-transformers model
+        recipe: Identifier of the text recipe
+
+    Returns:
+        Array of HASH_DTYPE hex digests, one per row
+    """
+    prefix = hashlib.sha256()
+    for part in (model_name, recipe):
+        prefix.update(part.encode('utf-8'))
+        prefix.update(b'\0')
+    hashes = []
+    for text in texts:
+        digest = prefix.copy()
+        digest.update(text.encode('utf-8'))
+        hashes.append(digest.hexdigest()[:32])
+    return np.array(hashes, dtype=HASH_DTYPE)
+
+
+def match_rows(hashes: np.ndarray, previous_hashes: np.ndarray) -> np.ndarray:
+    """
+    Find a previous row with the same content hash for each row
+
+    Args:
+        hashes: Content hashes of the current rows
+        previous_hashes: Content hashes of the stored rows
+
+    Returns:
+        int64 array with, for each current row, a matching stored row or -1
+    """
+    hashes = np.asarray(hashes, dtype=HASH_DTYPE)
+    if len(previous_hashes) == 0:
+        return np.full(len(hashes), -1, dtype=np.int64)
+    order = np.argsort(previous_hashes, kind='stable')
+    sorted_hashes = np.asarray(previous_hashes)[order]
+    positions = np.minimum(np.searchsorted(sorted_hashes, hashes), len(sorted_hashes) - 1)
+    found = sorted_hashes[positions] == hashes
+    return np.where(found, order[positions], -1).astype(np.int64)
+
+
+def update_embeddings(
+    texts: Sequence[str],
+    hashes: np.ndarray,
+    previous: Optional[StoredEmbeddings],
+    encode: Callable[[List[str]], np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Embed rows, copying those whose content is already in a stored version
+
+    Only rows with a new or changed content hash are encoded; stored rows
+    that no current row matches are dropped. Rows come back L2-normalized,
+    like the rows of a store version.
+
+    Args:
+        texts: Encoder input per row
+        hashes: Content hash per row, from content_hashes
+        previous: Store version to reuse rows from, None to encode everything
+        encode: Encodes a list of texts into an (n, d) matrix
+
+    Returns:
+        Tuple of (float32 embedding matrix, matched previous row per row or -1)
+    """
+    previous_rows = np.full(len(texts), -1, dtype=np.int64)
+    if previous is not None and previous.hashes is not None:
+        previous_rows = match_rows(hashes, previous.hashes)
+
+    fresh = np.flatnonzero(previous_rows < 0)
+    reused = np.flatnonzero(previous_rows >= 0)
+    encoded = l2_normalize(encode([texts[i] for i in fresh])) if len(fresh) else None
+    if encoded is not None:
+        dims = encoded.shape[1]
+    elif previous is not None:
+        dims = previous.embeddings.shape[1]
+    else:
+        dims = 0
+
+    embeddings = np.empty((len(texts), dims), dtype=np.float32)
+    if len(reused):
+        rows = previous.embeddings[previous_rows[reused]]
+        embeddings[reused] = rows if previous.metadata.get('normalized') else l2_normalize(rows)
+    if encoded is not None:
+        embeddings[fresh] = encoded
+    return embeddings, previous_rows
+
+
+def _encode_header(header: Dict[str, Any]) -> bytes:
+    """Serialize a header, padding it so the matrix is aligned"""
+    raw = json.dumps(header, sort_keys=True).encode('utf-8')
+    prefix = len(MAGIC) + 4
+    padding = -(prefix + len(raw)) % DATA_ALIGNMENT
+    raw += b' ' * padding
+    return MAGIC + struct.pack('<I', len(raw)) + raw
+
+
+def _read_header(f) -> Dict[str, Any]:
+    """Read and validate the header at the start of a store file"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not an embedding store file")
+    (length,) = struct.unpack('<I', f.read(4))
+    header = json.loads(f.read(length).decode('utf-8'))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported store format {header.get('format_version')}")
+    return header
+
+
+class EmbeddingStoreWriter:
+    """
+    Write a store version a chunk of rows at a time
+
+    Rows are L2-normalized and the header flags the version as normalized,
+    so inner products with a normalized query are cosine similarities.
+    Rows go straight to their place in the version file, after room
+    reserved for the header, so memory stays bounded by the chunk size
+    however many rows are written. Row ids are spooled to a side file and
+    padded to a common width on commit. Nothing is visible to readers
+    until commit makes the version current.
+    """
+
+    def __init__(
+        self,
+        store_dir: Union[str, Path],
+        model_name: str,
+        recipe: str = EMBEDDING_TEXT_RECIPE,
+        dtype: str = "float32"
+    ):
+        """
+        Args:
+            store_dir: Directory holding store versions
+            model_name: Name of the sentence-transformers model
+            recipe: Identifier of the text recipe
+            dtype: Storage dtype, float32 or float16
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}, use one of {SUPPORTED_DTYPES}")
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.recipe = recipe
+        self.dtype = dtype
+        self.rows = 0
+        self.dims: Optional[int] = None
+        self.created = datetime.now().isoformat()
+        self.version = f"v{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{os.getpid()}"
+        self.path = self.store_dir / f"{self.version}.emb"
+        self._tmp_path = self.store_dir / f"{self.version}.emb.tmp"
+        self._ids_path = self.store_dir / f"{self.version}.ids.tmp"
+        self._hashes_path = self.store_dir / f"{self.version}.hashes.tmp"
+        self._id_chunks: List[Tuple[int, int]] = []
+        self._has_hashes: Optional[bool] = None
+
+        # Reserve room for the largest header this version could need
+        self.data_offset = len(_encode_header(self._header(
+            fingerprint='f' * 128, shape=[10 ** 15, 10 ** 6], ids_dtype='|S1000000',
+            offsets={'data_offset': 10 ** 15, 'ids_offset': 10 ** 15, 'hashes_offset': 10 ** 15}
+        )))
+        self._file = open(self._tmp_path, 'wb')
+        self._file.seek(self.data_offset)
+        self._ids_file = open(self._ids_path, 'wb')
+        self._hashes_file = open(self._hashes_path, 'wb')
+
+    def _header(self, fingerprint: str, shape: List[int], ids_dtype: str,
+                offsets: Dict[str, int]) -> Dict[str, Any]:
+        return {
+            'format_version': FORMAT_VERSION,
+            'dtype': self.dtype,
+            'shape': shape,
+            'ids_dtype': ids_dtype,
+            'model_name': self.model_name,
+            'recipe': self.recipe,
+            'fingerprint': fingerprint,
+            'normalized': True,
+            'created': self.created,
+            **offsets
+        }
+
+    def append(self, embeddings: np.ndarray, row_ids: Sequence[str],
+               hashes: Optional[np.ndarray] = None) -> None:
+        """
+        Write the next rows, L2-normalized
+
+        Args:
+            embeddings: (n, d) embedding rows
+            row_ids: Identifier of each row
+            hashes: Content hash of each row; pass them for every chunk or none
+        """
+        if np.ndim(embeddings) != 2:
+            raise ValueError("embeddings must be a 2-D matrix")
+        matrix = np.ascontiguousarray(l2_normalize(embeddings), dtype=self.dtype)
+        if len(row_ids) != len(matrix):
+            raise ValueError("row_ids must have one entry per embedding row")
+        if hashes is not None and len(hashes) != len(matrix):
+            raise ValueError("hashes must have one entry per embedding row")
+        if self.dims is not None and matrix.shape[1] != self.dims:
+            raise ValueError(f"Expected {self.dims}-dimensional embeddings, got {matrix.shape[1]}")
+        if self._has_hashes is not None and self._has_hashes != (hashes is not None):
+            raise ValueError("hashes must be given for every chunk or for none")
+        self.dims = matrix.shape[1]
+        self._has_hashes = hashes is not None
+
+        ids = np.char.encode(np.asarray(list(row_ids), dtype=str), 'utf-8')
+        if ids.dtype.itemsize == 0:
+            ids = ids.astype('S1')
+        self._file.write(matrix.tobytes())
+        self._ids_file.write(ids.tobytes())
+        self._id_chunks.append((len(ids), ids.dtype.itemsize))
+        if hashes is not None:
+            self._hashes_file.write(np.ascontiguousarray(hashes, dtype=HASH_DTYPE).tobytes())
+        self.rows += len(matrix)
+
+    def commit(self, fingerprint: str) -> Path:
+        """
+        Finish the version file and atomically make it the current one
+
+        Args:
+            fingerprint: Fingerprint from compute_fingerprint
+
+        Returns:
+            Path of the written version file
+        """
+        dims = self.dims or 0
+        self._ids_file.close()
+        self._hashes_file.close()
+
+        # Pad the spooled row ids to the widest one, a chunk at a time
+        width = max((itemsize for _, itemsize in self._id_chunks), default=1)
+        ids_offset = self._file.tell()
+        with open(self._ids_path, 'rb') as f:
+            for count, itemsize in self._id_chunks:
+                chunk = np.frombuffer(f.read(count * itemsize), dtype=f'S{itemsize}')
+                self._file.write(chunk.astype(f'S{width}').tobytes())
+
+        offsets = {'data_offset': self.data_offset, 'ids_offset': ids_offset}
+        if self._has_hashes:
+            offsets['hashes_offset'] = self._file.tell()
+            with open(self._hashes_path, 'rb') as f:
+                shutil.copyfileobj(f, self._file)
+
+        header = self._header(fingerprint, [self.rows, dims], np.dtype(f'S{width}').str, offsets)
+        encoded = _encode_header(header)
+        if len(encoded) > self.data_offset:
+            raise ValueError("Embedding store header does not fit its reserved space")
+        self._file.seek(0)
+        self._file.write(encoded + b' ' * (self.data_offset - len(encoded)))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        self._remove_spool()
+
+        pointer_tmp = self.store_dir / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+        pointer_tmp.write_text(self.path.name, encoding='utf-8')
+        os.replace(pointer_tmp, self.store_dir / CURRENT_FILE)
+
+        _prune_versions(self.store_dir, keep=self.path.name)
+        return self.path
+
+    def abort(self) -> None:
+        """Discard everything written so far"""
+        for f in (self._file, self._ids_file, self._hashes_file):
+            f.close()
+        self._tmp_path.unlink(missing_ok=True)
+        self._remove_spool()
+
+    def _remove_spool(self) -> None:
+        self._ids_path.unlink(missing_ok=True)
+        self._hashes_path.unlink(missing_ok=True)
+
+
+def write_embedding_store(
+    store_dir: Union[str, Path],
+    embeddings: np.ndarray,
+    row_ids: Sequence[str],
+    fingerprint: str,
+    model_name: str,
+    recipe: str = EMBEDDING_TEXT_RECIPE,
+    dtype: str = "float32",
+    hashes: Optional[np.ndarray] = None
+) -> Path:
+    """
+    Write a new store version and atomically make it the current one
+
+    The version file is fully written before CURRENT is replaced with
+    os.replace, so readers always see either the old or the new version.
+    Processes that still map an older version keep using it until they
+    reopen the store.
+
+    Args:
+        store_dir: Directory holding store versions
+        embeddings: Product embedding matrix
+        row_ids: Identifier of each embedding row
+        fingerprint: Fingerprint from compute_fingerprint
+        model_name: Name of the sentence-transformers model
+        recipe: Identifier of the text recipe
+        dtype: Storage dtype, float32 or float16
+        hashes: Content hash of each row, from content_hashes, so later
+            updates can reuse unchanged rows
+
+    Returns:
+        Path of the written version file
+    """
+    writer = EmbeddingStoreWriter(store_dir, model_name, recipe=recipe, dtype=dtype)
+    try:
+        writer.append(embeddings, row_ids, hashes)
+        return writer.commit(fingerprint)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+@contextlib.contextmanager
+def store_lock(store_dir: Union[str, Path]) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a store directory, shared by all processes
+
+    Blocks until the lock is free. Used so that only one process encodes
+    and writes a new version while the others wait and then map it.
+
+    Args:
+        store_dir: Directory holding store versions
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    with open(store_dir / LOCK_FILE, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    # Locks the first byte; LK_LOCK gives up after ten seconds
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _prune_versions(store_dir: Path, keep: str) -> None:
+    """Remove old versions, keeping the newest few for in-flight readers"""
+    versions = sorted(store_dir.glob("v*.emb"), key=lambda p: p.stat().st_mtime, reverse=True)
+    stale = [p for p in versions if p.name != keep][KEEP_VERSIONS - 1:]
+    for path in stale:
+        try:
+            path.unlink()
+        except OSError:
+            # Still mapped by another process on platforms that forbid it
+            pass
+
+
+def open_embedding_store(
+    store_dir: Union[str, Path],
+    fingerprint: Optional[str] = None,
+    expected_rows: Optional[int] = None
+) -> Optional[StoredEmbeddings]:
+    """
+    Memory-map the current store version if it matches the current inputs
+
+    The matrix is opened read-only with np.memmap, so every process that
+    opens the same version shares its pages through the OS page cache.
+
+    Args:
+        store_dir: Directory holding store versions
+        fingerprint: Fingerprint of the current product file, model and recipe
+        expected_rows: Number of product rows the matrix must cover
+
+    Returns:
+        The mapped store, or None if it is missing or stale
+    """
+    store_dir = Path(store_dir)
+    pointer = store_dir / CURRENT_FILE
+    if not pointer.exists():
+        logger.info(f"No embedding store found at {store_dir}")
+        return None
+
+    path = store_dir / pointer.read_text(encoding='utf-8').strip()
+    try:
+        with open(path, 'rb') as f:
+            header = _read_header(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read embedding store {path}: {str(e)}")
+        return None
+
+    if fingerprint is not None and header.get('fingerprint') != fingerprint:
+        logger.info(f"Embedding store {path} is stale (fingerprint mismatch)")
+        return None
+    if fingerprint is not None and not header.get('normalized'):
+        # Its rows can still be reused, and are normalized when copied
+        logger.info(f"Embedding store {path} predates normalized embeddings")
+        return None
+
+    rows, dims = header['shape']
+    if expected_rows is not None and rows != expected_rows:
+        logger.info(f"Embedding store {path} has {rows} rows, expected {expected_rows}")
+        return None
+
+    if rows == 0:
+        # np.memmap cannot map an empty region
+        return StoredEmbeddings(
+            path, header,
+            np.zeros((0, dims), dtype=header['dtype']),
+            np.zeros(0, dtype=np.dtype(header['ids_dtype'])),
+            np.zeros(0, dtype=HASH_DTYPE) if 'hashes_offset' in header else None
+        )
+
+    embeddings = np.memmap(
+        path, dtype=header['dtype'], mode='r',
+        offset=header['data_offset'], shape=(rows, dims)
+    )
+    row_ids = np.memmap(
+        path, dtype=np.dtype(header['ids_dtype']), mode='r',
+        offset=header['ids_offset'], shape=(rows,)
+    )
+    # Versions written before content hashes were stored have none
+    hashes = None
+    if 'hashes_offset' in header:
+        hashes = np.memmap(
+            path, dtype=HASH_DTYPE, mode='r',
+            offset=header['hashes_offset'], shape=(rows,)
+        )
+    return StoredEmbeddings(path, header, embeddings, row_ids, hashes)
@@ -0,0 +1,154 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .lexical import BM25Index
+from .vector_index import VectorIndex, top_k
+
+logger = logging.getLogger(__name__)
+
+FUSION_METHODS = ("rrf", "weighted")
+
+# Runs the two retrievers of a search side by side. Shared by every
+# retriever, so rebuilding one on a reload does not leave idle threads behind.
+_search_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid")
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[np.ndarray],
+    weights: Optional[Sequence[float]] = None,
+    rrf_k: int = 60
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse ranked lists with reciprocal rank fusion
+
+    Each document scores sum(weight / (rrf_k + rank)) over the lists it
+    appears in, with ranks starting at 1.
+
+    Args:
+        rankings: Document ids per retriever, best first
+        weights: Weight per retriever, defaults to 1.0 each
+        rrf_k: Damping constant, larger values flatten rank differences
+
+    Returns:
+        Tuple of (document ids, fused scores), in no particular order
+    """
+    weights = weights or [1.0] * len(rankings)
+    ids = np.concatenate(rankings) if rankings else np.empty(0, dtype=np.int64)
+    contributions = np.concatenate([
+        weight / (rrf_k + np.arange(1, len(ranking) + 1, dtype=np.float32))
+        for ranking, weight in zip(rankings, weights)
+    ]) if rankings else np.empty(0, dtype=np.float32)
+    unique, inverse = np.unique(ids, return_inverse=True)
+    return unique, np.bincount(inverse, weights=contributions, minlength=len(unique)).astype(np.float32)
+
+
+def weighted_score_fusion(
+    results: Sequence[Tuple[np.ndarray, np.ndarray]],
+    weights: Optional[Sequence[float]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse scored lists by summing min-max normalized scores
+
+    Args:
+        results: (document ids, scores) per retriever
+        weights: Weight per retriever, defaults to 1.0 each
+
+    Returns:
+        Tuple of (document ids, fused scores), in no particular order
+    """
+    weights = weights or [1.0] * len(results)
+    all_ids, all_scores = [], []
+    for (ids, scores), weight in zip(results, weights):
+        if len(ids) == 0:
+            continue
+        low, high = float(scores.min()), float(scores.max())
+        normalized = (scores - low) / (high - low) if high > low else np.ones_like(scores)
+        all_ids.append(ids)
+        all_scores.append(weight * normalized.astype(np.float32))
+    if not all_ids:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    unique, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+    fused = np.bincount(inverse, weights=np.concatenate(all_scores), minlength=len(unique))
+    return unique, fused.astype(np.float32)
+
+
+class HybridRetriever:
+    """
+    Runs the lexical and vector retrievers concurrently and fuses their results
+
+    Each retriever contributes its top `candidates` rows; fusion then picks
+    the final top-k. Both retrievers address products by row position, so
+    they must be built over the same product data.
+    """
+
+    def __init__(self, lexical_index: BM25Index, vector_index: VectorIndex,
+                 encode_query: Callable[[str], np.ndarray], fusion: str = "rrf",
+                 weights: Tuple[float, float] = (1.0, 1.0), rrf_k: int = 60,
+                 candidates: int = 50):
+        """
+        Args:
+            lexical_index: BM25 index over the products
+            vector_index: Vector index over the product embeddings
+            encode_query: Function mapping a query to its embedding
+            fusion: "rrf" or "weighted"
+            weights: (lexical, semantic) weights
+            rrf_k: Damping constant for reciprocal rank fusion
+            candidates: Rows taken from each retriever before fusion
+        """
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion '{fusion}', use one of {FUSION_METHODS}")
+        self.lexical_index = lexical_index
+        self.vector_index = vector_index
+        self.encode_query = encode_query
+        self.fusion = fusion
+        self.weights = weights
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+
+    def lexical_search(self, query: str, k: int,
+                       mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows by BM25 score, restricted to mask"""
+        # Any term may match: fusion ranks partial matches below full ones,
+        # and conversational queries rarely have every word in a product
+        ids, scores = self.lexical_index.score(query, require_all=False)
+        if mask is not None:
+            allowed = mask[ids]
+            ids, scores = ids[allowed], scores[allowed]
+        best = top_k(scores, k)
+        return ids[best], scores[best]
+
+    def semantic_search(self, query: str, k: int,
+                        mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows by embedding similarity, restricted to mask"""
+        return self.vector_index.search(self.encode_query(query), k, mask=mask)
+
+    def search(self, query: str, k: int,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retrieve the top-k rows by fused lexical and semantic relevance
+
+        Args:
+            query: Query text
+            k: Number of results
+            mask: Optional boolean array, only rows where it is True are returned
+
+        Returns:
+            Tuple of (row positions, fused scores), best first
+        """
+        fetch = max(k, self.candidates)
+        lexical = _search_pool.submit(self.lexical_search, query, fetch, mask)
+        semantic = _search_pool.submit(self.semantic_search, query, fetch, mask)
+        results: List[Tuple[np.ndarray, np.ndarray]] = [lexical.result(), semantic.result()]
+
+        if self.fusion == "rrf":
+            ids, scores = reciprocal_rank_fusion(
+                [ids for ids, _ in results], self.weights, self.rrf_k
+            )
+        else:
+            ids, scores = weighted_score_fusion(results, self.weights)
+
+        best = top_k(scores, k)
+        return ids[best], scores[best]
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..cleaning import join_text
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Product columns indexed for lexical search
+LEXICAL_FIELDS = ('Product_Title', 'Description', 'Category')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase alphanumeric terms
+
+    A trailing plural "s" is dropped from longer terms so "guitar" and
+    "guitars" match each other.
+
+    Args:
+        text: Input text
+
+    Returns:
+        List of terms
+    """
+    if not isinstance(text, str):
+        return []
+    return [
+        term[:-1] if len(term) > 3 and term.endswith('s') and not term.endswith('ss') else term
+        for term in TOKEN_PATTERN.findall(text.lower())
+    ]
+
+
+def build_lexical_texts(df: pd.DataFrame) -> List[str]:
+    """
+    Build the text indexed for each product row
+
+    Args:
+        df: Product DataFrame
+
+    Returns:
+        List of texts, one per row
+    """
+    return join_text(df, LEXICAL_FIELDS).tolist()
+
+
+class BM25Index:
+    """
+    Inverted index over product text with BM25 scoring
+
+    Postings are stored in CSR form: the documents containing term t are
+    doc_ids[offsets[t]:offsets[t + 1]] (sorted), with term frequencies in
+    the matching slice of tfs. Multi-term queries match only documents
+    containing every term, found by intersecting posting lists shortest
+    first, so work is proportional to the postings touched.
+    """
+
+    def __init__(self, vocab: Dict[str, int], offsets: np.ndarray, doc_ids: np.ndarray,
+                 tfs: np.ndarray, doc_lengths: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+        doc_freqs = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((self.num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    @classmethod
+    def build(cls, texts: Iterable[str], **params) -> "BM25Index":
+        """
+        Tokenize documents and build their posting lists
+
+        Args:
+            texts: Document texts, in row order
+            **params: BM25 parameters k1 and b
+        """
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        doc_lengths: List[int] = []
+
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids_arr = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids_arr, kind='stable')
+        counts = np.bincount(term_ids_arr, minlength=len(vocab))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(
+            vocab,
+            offsets,
+            np.asarray(doc_ids, dtype=np.int32)[order],
+            np.asarray(tfs, dtype=np.float32)[order],
+            np.asarray(doc_lengths, dtype=np.float32),
+            **params
+        )
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def score(self, query: str, require_all: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the documents matching the query terms and score them
+
+        Args:
+            query: Query text
+            require_all: Match only documents containing every term; otherwise
+                any term matches and unknown terms are ignored
+
+        Returns:
+            Tuple of (document ids, BM25 scores), in document order
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not require_all:
+            terms = [t for t in terms if t in self.vocab]
+        if not terms or any(term not in self.vocab for term in terms):
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        term_ids = sorted((self.vocab[t] for t in terms), key=lambda t: self.offsets[t + 1] - self.offsets[t])
+        if require_all:
+            matches = self._postings(term_ids[0])[0]
+            for term_id in term_ids[1:]:
+                if len(matches) == 0:
+                    break
+                matches = np.intersect1d(matches, self._postings(term_id)[0], assume_unique=True)
+        else:
+            matches = np.unique(np.concatenate([self._postings(t)[0] for t in term_ids]))
+
+        scores = np.zeros(len(matches), dtype=np.float32)
+        if len(matches) == 0:
+            return matches, scores
+
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[matches] / self.avg_doc_length)
+        for term_id in term_ids:
+            docs, tfs = self._postings(term_id)
+            positions = np.minimum(np.searchsorted(docs, matches), len(docs) - 1)
+            # Documents without the term contribute nothing for it
+            tf = np.where(docs[positions] == matches, tfs[positions], 0.0)
+            scores += self.idf[term_id] * tf * (self.k1 + 1) / (tf + length_norm)
+        return matches, scores
+
+    def save(self, path: Union[str, Path], fingerprint: str) -> None:
+        """
+        Persist the index, tagged with the product data it was built from
+
+        Args:
+            path: Destination .npz file
+            fingerprint: Digest of the product file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        metadata = {'fingerprint': fingerprint, 'k1': self.k1, 'b': self.b}
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                metadata=np.array(json.dumps(metadata)),
+                terms=np.array(terms, dtype=str),
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                tfs=self.tfs,
+                doc_lengths=self.doc_lengths
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], fingerprint: str) -> Optional["BM25Index"]:
+        """
+        Load a persisted index if it was built from the given product data
+
+        Args:
+            path: .npz file written by save
+            fingerprint: Digest of the current product file
+
+        Returns:
+            The index, or None if it is missing or stale
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                metadata = json.loads(str(data['metadata']))
+                if metadata.get('fingerprint') != fingerprint:
+                    logger.info(f"Lexical index {path} is stale, ignoring it")
+                    return None
+                vocab = {term: i for i, term in enumerate(data['terms'].tolist())}
+                return cls(
+                    vocab, data['offsets'], data['doc_ids'], data['tfs'], data['doc_lengths'],
+                    k1=metadata['k1'], b=metadata['b']
+                )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read lexical index {path}: {str(e)}")
+            return None
@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from .vector_index import inner_product_scores
+
+logger = logging.getLogger(__name__)
+
+# Rows of the query side and columns of the candidate side per matmul block;
+# the similarity block is at most ROW_BLOCK x COLUMN_BLOCK float32 values
+ROW_BLOCK = 1024
+COLUMN_BLOCK = 16384
+
+
+def _merge_top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the k best candidates in each row (unordered)"""
+    if scores.shape[1] <= k:
+        return ids, scores
+    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(ids, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+
+class NeighborTable:
+    """
+    The k most similar products of every product
+
+    Row i of ids holds the row positions of product i's neighbours, most
+    similar first, with their cosine similarities in the same row of scores.
+    Products are never their own neighbours.
+    """
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray):
+        self.ids = ids
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def k(self) -> int:
+        return self.ids.shape[1]
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, k: int = 50) -> "NeighborTable":
+        """
+        Find each row's top-k neighbours by cosine similarity
+
+        Similarities are computed one ROW_BLOCK x COLUMN_BLOCK matrix product
+        at a time, keeping a running top-k per row, so memory stays bounded
+        for any catalog size.
+
+        Args:
+            embeddings: (n, d) L2-normalized embedding matrix, float32 or
+                float16, as held by the embedding store
+            k: Neighbours per product, capped at n - 1
+        """
+        n = len(embeddings)
+        k = max(0, min(k, n - 1))
+        ids = np.empty((n, k), dtype=np.int32)
+        scores = np.empty((n, k), dtype=np.float16)
+        if k == 0:
+            return cls(ids, scores)
+
+        for start in range(0, n, ROW_BLOCK):
+            end = min(start + ROW_BLOCK, n)
+            rows = embeddings[start:end]
+            best_ids = np.empty((end - start, 0), dtype=np.int64)
+            best_scores = np.empty((end - start, 0), dtype=np.float32)
+
+            for col_start in range(0, n, COLUMN_BLOCK):
+                col_end = min(col_start + COLUMN_BLOCK, n)
+                sims = inner_product_scores(rows, embeddings[col_start:col_end])
+
+                # A product is not its own neighbour
+                diagonal = np.arange(max(start, col_start), min(end, col_end))
+                sims[diagonal - start, diagonal - col_start] = -np.inf
+
+                take = min(k, sims.shape[1])
+                part = np.argpartition(-sims, take - 1, axis=1)[:, :take]
+                best_ids, best_scores = _merge_top_k(
+                    np.concatenate([best_ids, part + col_start], axis=1),
+                    np.concatenate([best_scores, np.take_along_axis(sims, part, axis=1)], axis=1),
+                    k
+                )
+
+            order = np.argsort(-best_scores, axis=1, kind='stable')
+            ids[start:end] = np.take_along_axis(best_ids, order, axis=1)
+            scores[start:end] = np.take_along_axis(best_scores, order, axis=1)
+
+        return cls(ids, scores)
+
+    def neighbors(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbour row positions and similarities of a product, most similar first"""
+        return self.ids[row], self.scores[row]
+
+    def save(self, path: Union[str, Path], fingerprint: str) -> None:
+        """
+        Persist the table, tagged with the embeddings it was built from
+
+        Args:
+            path: Destination .npz file
+            fingerprint: Fingerprint of the product embeddings
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        metadata = {'fingerprint': fingerprint, 'rows': len(self), 'k': self.k}
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, metadata=np.array(json.dumps(metadata)), ids=self.ids, scores=self.scores)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], fingerprint: str,
+             expected_rows: Optional[int] = None) -> Optional["NeighborTable"]:
+        """
+        Load a persisted table if it was built from the given embeddings
+
+        Args:
+            path: .npz file written by save
+            fingerprint: Fingerprint of the current product embeddings
+            expected_rows: Number of products the table must cover
+
+        Returns:
+            The table, or None if it is missing or stale
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                metadata = json.loads(str(data['metadata']))
+                if metadata.get('fingerprint') != fingerprint or (
+                    expected_rows is not None and metadata.get('rows') != expected_rows
+                ):
+                    logger.info(f"Neighbour table {path} is stale, ignoring it")
+                    return None
+                return cls(data['ids'], data['scores'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read neighbour table {path}: {str(e)}")
+            return None
@@ -0,0 +1,191 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per word-piece token, used to size batches without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Model loaded once per worker process by _init_worker
+_worker_model: Any = None
+
+
+def _load_model(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    """Load the model in a pool worker and limit its torch threads"""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = _load_model(model_name)
+
+
+def _encode_in_worker(start: int, texts: List[str]) -> Tuple[int, np.ndarray]:
+    embeddings = _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+    return start, np.asarray(embeddings, dtype=np.float32)
+
+
+def plan_batches(lengths: np.ndarray, batch_tokens: int, max_seq_length: int,
+                 min_batch_size: int = 8, max_batch_size: int = 256) -> List[Tuple[int, int]]:
+    """
+    Split texts sorted by length (longest first) into batches of similar cost
+
+    Every text in a batch is padded to the longest one, so each batch holds
+    about batch_tokens tokens: many short texts or a few long ones.
+
+    Args:
+        lengths: Character length of each text, in descending order
+        batch_tokens: Padded tokens per forward pass
+        max_seq_length: Token length texts are truncated to by the model
+        min_batch_size: Smallest batch, however long the texts
+        max_batch_size: Largest batch, however short the texts
+
+    Returns:
+        (start, end) slices of the sorted texts
+    """
+    batches = []
+    start = 0
+    while start < len(lengths):
+        longest = min(max_seq_length, max(1, int(lengths[start]) // CHARS_PER_TOKEN + 2))
+        size = int(np.clip(batch_tokens // longest, min_batch_size, max_batch_size))
+        end = min(start + size, len(lengths))
+        batches.append((start, end))
+        start = end
+    return batches
+
+
+class ParallelEncoder:
+    """
+    Encodes large text collections across a pool of model worker processes
+
+    Texts are sorted by length so each batch pads to similar lengths, batch
+    sizes are chosen from the text length (see plan_batches), batches are
+    spread over the workers and the embeddings are returned in input order.
+    With one worker, batches are encoded in this process instead.
+
+    The pool is started on first use and kept until close(), so encoding a
+    catalog chunk by chunk loads the model once per worker.
+    """
+
+    def __init__(self, model_name: str, workers: Optional[int] = None,
+                 batch_tokens: int = 8192, max_seq_length: int = 256,
+                 load_model: Optional[Callable[[str], Any]] = None):
+        """
+        Args:
+            model_name: SentenceTransformer model name or path
+            workers: Number of worker processes (default: one per CPU core)
+            batch_tokens: Padded tokens per forward pass
+            max_seq_length: Token length texts are truncated to by the model
+            load_model: Loads the model for single-process encoding
+                (default: SentenceTransformer(model_name))
+        """
+        self.model_name = model_name
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.batch_tokens = max(1, batch_tokens)
+        self.max_seq_length = max_seq_length
+        self._load_model = load_model or _load_model
+        self._model = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.sentences = 0
+        self.seconds = 0.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            logger.info(f"Starting {self.workers} encoder processes for {self.model_name}...")
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # Spawned workers avoid inheriting torch thread state from the parent
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, threads)
+            )
+        return self._pool
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Encode texts into an (n, d) float32 matrix in input order
+
+        Args:
+            texts: Texts to encode
+
+        Returns:
+            Embeddings, row i for texts[i]
+        """
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        start_time = time.perf_counter()
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        order = np.argsort(-lengths, kind='stable')
+        batches = plan_batches(lengths[order], self.batch_tokens, self.max_seq_length)
+        sorted_texts = [texts[i] for i in order]
+
+        output: Optional[np.ndarray] = None
+
+        def place(start: int, embeddings: np.ndarray):
+            nonlocal output
+            if output is None:
+                output = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+            output[order[start:start + len(embeddings)]] = embeddings
+
+        if self.workers == 1 or len(batches) == 1:
+            if self._model is None:
+                logger.info(f"Loading {self.model_name}...")
+                self._model = self._load_model(self.model_name)
+            for start, end in batches:
+                place(start, np.asarray(self._model.encode(
+                    sorted_texts[start:end], batch_size=end - start, show_progress_bar=False
+                ), dtype=np.float32))
+        else:
+            pool = self._get_pool()
+            futures = [
+                pool.submit(_encode_in_worker, start, sorted_texts[start:end])
+                for start, end in batches
+            ]
+            try:
+                for future in as_completed(futures):
+                    place(*future.result())
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        seconds = time.perf_counter() - start_time
+        self.sentences += len(texts)
+        self.seconds += seconds
+        logger.info(
+            f"Encoded {len(texts):,} texts in {len(batches)} batches on {self.workers} "
+            f"worker(s): {len(texts) / seconds:,.0f} sentences/s"
+        )
+        return output
+
+    @property
+    def throughput(self) -> float:
+        """Sentences per second over every encode call so far"""
+        return self.sentences / self.seconds if self.seconds > 0 else 0.0
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self) -> "ParallelEncoder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -2,7 +2,7 @@ import pandas as pd
 from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime
 import numpy as np
-from sentence_transformers import util
+from .vector_index import inner_product_scores, l2_normalize
 
 def preprocess_text(text: str) -> str:
     """
@@ -34,12 +34,13 @@ def calculate_semantic_similarity(
     
     Args:
         query_embedding: Query embedding vector
-        document_embeddings: Matrix of document embeddings
+        document_embeddings: Matrix of L2-normalized document embeddings,
+            such as the rows of the embedding store
     
     Returns:
         Array of similarity scores
     """
-    return util.cos_sim(query_embedding, document_embeddings)[0]
+    return inner_product_scores(document_embeddings, l2_normalize(query_embedding))
 
 def format_price(price: float) -> str:
     """
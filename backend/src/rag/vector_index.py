@@ -0,0 +1,504 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per block, bounds the temporary float32 copy made when the
+# matrix is stored as float16
+SCORE_BLOCK_ROWS = 65536
+# Rows assigned to clusters per block, bounds the (rows, nlist) score matrix
+ASSIGN_BLOCK_ROWS = 8192
+# In-memory copies of the embeddings used for first-stage scoring
+QUANTIZATION_MODES = ("none", "float16", "int8")
+# Quantized rows widened to float32 per block; small enough for the
+# widened block to stay in cache between the conversion and the dot product
+QUANTIZED_BLOCK_ROWS = 1024
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale vectors to unit L2 norm, so their inner products are cosine similarities
+
+    Args:
+        vectors: (d,) vector or (n, d) rows
+
+    Returns:
+        float32 copy with unit-length rows; zero rows stay zero
+    """
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def inner_product_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Score every row of a matrix against one or more query vectors
+
+    This is the similarity kernel for every search path. Stored product
+    embeddings and query embeddings are L2-normalized, so the scores are
+    cosine similarities.
+
+    Args:
+        matrix: (n, d) embedding matrix, possibly memory-mapped
+        query: (d,) query vector or (m, d) query rows
+
+    Returns:
+        (n,) or (n, m) float32 array of inner products
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if matrix.dtype == np.float32:
+        return np.dot(matrix, query.T)
+
+    scores = np.empty((len(matrix),) + query.shape[:-1], dtype=np.float32)
+    for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        scores[start:start + len(block)] = np.dot(block, query.T)
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Select the positions of the k highest scores, best first
+
+    Args:
+        scores: Score vector
+        k: Number of positions to return
+
+    Returns:
+        Positions into scores sorted by descending score
+    """
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class QuantizedEmbeddings:
+    """
+    Compact in-memory copy of an embedding matrix for approximate scoring
+
+    float16 halves the float32 footprint. int8 quarters it with a symmetric
+    scale per dimension: row values are stored as round(x / scale) and a
+    query is scored as codes @ (query * scale), so no row is dequantized.
+    """
+
+    def __init__(self, mode: str, codes: np.ndarray, scale: Optional[np.ndarray] = None):
+        self.mode = mode
+        self.codes = codes
+        self.scale = scale
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, mode: str) -> "QuantizedEmbeddings":
+        """
+        Quantize an embedding matrix blockwise
+
+        Args:
+            embeddings: (n, d) embedding matrix, possibly memory-mapped
+            mode: "float16" or "int8"
+        """
+        if mode == "float16":
+            codes = np.empty(embeddings.shape, dtype=np.float16)
+            for start in range(0, len(embeddings), SCORE_BLOCK_ROWS):
+                codes[start:start + SCORE_BLOCK_ROWS] = embeddings[start:start + SCORE_BLOCK_ROWS]
+            return cls(mode, codes)
+        if mode != "int8":
+            raise ValueError(f"Unknown quantization mode '{mode}', use 'float16' or 'int8'")
+
+        peaks = np.zeros(embeddings.shape[1], dtype=np.float32)
+        for start in range(0, len(embeddings), SCORE_BLOCK_ROWS):
+            block = np.asarray(embeddings[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            if len(block):
+                np.maximum(peaks, np.abs(block).max(axis=0), out=peaks)
+        scale = np.where(peaks > 0, peaks / 127.0, 1.0).astype(np.float32)
+        codes = np.empty(embeddings.shape, dtype=np.int8)
+        for start in range(0, len(embeddings), SCORE_BLOCK_ROWS):
+            block = np.asarray(embeddings[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint(block / scale), -127, 127)
+        return cls(mode, codes, scale)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Approximate inner products of the query with all rows, or the given rows
+
+        Returns:
+            float32 score array aligned with rows
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if self.scale is not None:
+            query = query * self.scale
+        codes = self.codes if rows is None else self.codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        block = np.empty((min(len(codes), QUANTIZED_BLOCK_ROWS), codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), QUANTIZED_BLOCK_ROWS):
+            rows_block = codes[start:start + QUANTIZED_BLOCK_ROWS]
+            widened = block[:len(rows_block)]
+            widened[...] = rows_block
+            np.dot(widened, query, out=scores[start:start + len(rows_block)])
+        return scores
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Assign each row to the centroid with the highest inner product"""
+    assignments = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _lists(assignments: np.ndarray, nlist: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Group row positions by assigned list: (list offsets, row ids ordered by list)"""
+    list_ids = np.argsort(assignments, kind='stable').astype(np.int64)
+    counts = np.bincount(assignments, minlength=nlist)
+    list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return list_offsets, list_ids
+
+
+class VectorIndex:
+    """Base class for product vector indexes over an embedding matrix"""
+
+    kind = "base"
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+        self.quantized: Optional[QuantizedEmbeddings] = None
+        self.rescore = 4
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def quantize(self, mode: str, rescore: int = 4) -> "VectorIndex":
+        """
+        Score rows on a quantized copy of the embeddings first
+
+        Searches then shortlist k * rescore rows by approximate score and
+        rank the shortlist by exact float32 inner products, so only the
+        shortlisted rows of the full-precision matrix are read.
+
+        Args:
+            mode: One of QUANTIZATION_MODES, "none" for exact scoring only
+            rescore: Shortlist size as a multiple of k
+
+        Returns:
+            This index
+        """
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}', use one of {QUANTIZATION_MODES}")
+        self.quantized = None if mode == "none" else QuantizedEmbeddings.build(self.embeddings, mode)
+        self.rescore = max(1, rescore)
+        return self
+
+    def _rank(self, query: np.ndarray, k: int,
+              rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k best of the given rows (all rows if None), best first, with
+        exact scores; rows are shortlisted on the quantized copy if there is one
+        """
+        if self.quantized is not None and len(self) > 0:
+            shortlist = top_k(self.quantized.scores(query, rows), k * self.rescore)
+            rows = np.sort(shortlist if rows is None else rows[shortlist])
+        scores = inner_product_scores(self.embeddings if rows is None else self.embeddings[rows], query)
+        best = top_k(scores, k)
+        return (best if rows is None else rows[best]), scores[best]
+
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None,
+               **params) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k rows with the highest inner product with the query
+
+        Args:
+            query: Query embedding
+            k: Number of results
+            mask: Optional boolean array, only rows where it is True are returned
+
+        Returns:
+            Tuple of (row positions, scores), best first
+        """
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Arrays needed to restore the index, excluding the embeddings"""
+        return {}
+
+    def updated(self, embeddings: np.ndarray, previous_rows: np.ndarray) -> "VectorIndex":
+        """
+        The index over a new embedding matrix that shares rows with this one
+
+        Args:
+            embeddings: New (n, d) embedding matrix
+            previous_rows: For each new row, the row of the indexed matrix
+                with the same embedding, or -1 if it is new or changed
+
+        Returns:
+            The updated index
+        """
+        return type(self)(embeddings)
+
+
+class FlatIndex(VectorIndex):
+    """Exact search by scoring every row"""
+
+    kind = "flat"
+
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None,
+               **params) -> Tuple[np.ndarray, np.ndarray]:
+        query = np.asarray(query, dtype=np.float32)
+        return self._rank(query, k, None if mask is None else np.flatnonzero(mask))
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted file index: rows are clustered with k-means and a query only
+    scores the rows in its nprobe closest clusters.
+
+    Higher nprobe raises recall at the cost of latency; nprobe equal to the
+    number of lists is exact search.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, embeddings: np.ndarray, centroids: np.ndarray,
+                 list_offsets: np.ndarray, list_ids: np.ndarray, nprobe: int = 8):
+        super().__init__(embeddings)
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: Optional[int] = None,
+              iterations: int = 10, sample_size: Optional[int] = None,
+              seed: int = 0, nprobe: int = 8) -> "IVFIndex":
+        """
+        Train centroids with k-means and assign every row to a list
+
+        Args:
+            embeddings: (n, d) embedding matrix
+            nlist: Number of clusters, defaults to sqrt(n)
+            iterations: k-means iterations
+            sample_size: Rows used for training, defaults to 256 per cluster
+            seed: Random seed for sampling and initialization
+            nprobe: Default number of lists probed per query
+        """
+        n = len(embeddings)
+        if n == 0:
+            raise ValueError("Cannot build an IVF index over an empty matrix")
+        nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+        sample_size = min(n, sample_size or 256 * nlist)
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n, size=sample_size, replace=False))
+        sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = _assign(sample, centroids)
+            counts = np.bincount(assignments, minlength=nlist)
+            order = np.argsort(assignments, kind='stable')
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            filled = counts > 0
+            centroids[filled] = (
+                np.add.reduceat(sample[order], starts[filled], axis=0)
+                / counts[filled, None]
+            )
+            # Re-seed empty clusters so every list stays useful
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centroids[empty] = sample[rng.integers(sample_size, size=len(empty))]
+
+        list_offsets, list_ids = _lists(_assign(embeddings, centroids), nlist)
+        return cls(embeddings, centroids, list_offsets, list_ids, nprobe=nprobe)
+
+    def _candidates(self, query: np.ndarray, nprobe: int, k: int,
+                    mask: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Row positions stored in the lists closest to the query
+
+        At least nprobe lists are probed. With a mask, further lists are
+        probed in order of closeness until k allowed rows are found, so
+        heavily filtered queries still fill their results.
+        """
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, self.nlist)
+        if mask is None:
+            probes = top_k(centroid_scores, nprobe)
+        else:
+            probes = np.argsort(-centroid_scores, kind='stable')
+
+        candidates = []
+        found = 0
+        for i, p in enumerate(probes):
+            if i >= nprobe and (mask is None or found >= k):
+                break
+            rows = self.list_ids[self.list_offsets[p]:self.list_offsets[p + 1]]
+            if mask is not None:
+                rows = rows[mask[rows]]
+                found += len(rows)
+            candidates.append(rows)
+        if not candidates:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(candidates)
+
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None,
+               nprobe: Optional[int] = None, **params) -> Tuple[np.ndarray, np.ndarray]:
+        query = np.asarray(query, dtype=np.float32)
+        candidates = np.sort(self._candidates(query, nprobe or self.nprobe, k, mask))
+        return self._rank(query, k, candidates)
+
+    def updated(self, embeddings: np.ndarray, previous_rows: np.ndarray) -> "IVFIndex":
+        """
+        Keep the trained centroids and the lists of unchanged rows; only new
+        and changed rows are assigned. Retrain with build once most of the
+        catalog has changed.
+        """
+        previous_lists = np.empty(len(self.list_ids), dtype=np.int32)
+        previous_lists[self.list_ids] = np.repeat(
+            np.arange(self.nlist, dtype=np.int32), np.diff(self.list_offsets)
+        )
+        assignments = np.empty(len(embeddings), dtype=np.int32)
+        reused = previous_rows >= 0
+        assignments[reused] = previous_lists[previous_rows[reused]]
+        fresh = np.flatnonzero(~reused)
+        if len(fresh):
+            assignments[fresh] = _assign(embeddings[fresh], self.centroids)
+        list_offsets, list_ids = _lists(assignments, self.nlist)
+        return IVFIndex(embeddings, self.centroids, list_offsets, list_ids, nprobe=self.nprobe)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets,
+            'list_ids': self.list_ids,
+        }
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (FlatIndex, IVFIndex)}
+
+
+def build_index(kind: str, embeddings: np.ndarray, **params) -> VectorIndex:
+    """
+    Build a vector index of the given kind
+
+    Args:
+        kind: One of INDEX_TYPES
+        embeddings: (n, d) embedding matrix
+        **params: Index-specific build parameters
+
+    Returns:
+        The built index
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', use one of {sorted(INDEX_TYPES)}")
+    if kind == FlatIndex.kind:
+        return FlatIndex(embeddings)
+    return INDEX_TYPES[kind].build(embeddings, **params)
+
+
+def save_index(index: VectorIndex, path: Union[str, Path], fingerprint: str) -> None:
+    """
+    Persist an index next to the embedding store it was built from
+
+    Args:
+        index: Index to save
+        path: Destination .npz file
+        fingerprint: Fingerprint of the embeddings the index was built over
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    metadata = {'kind': index.kind, 'fingerprint': fingerprint, 'rows': len(index)}
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, metadata=np.array(json.dumps(metadata)), **index.state())
+    os.replace(tmp_path, path)
+
+
+def load_index(
+    path: Union[str, Path],
+    embeddings: np.ndarray,
+    fingerprint: str,
+    **params
+) -> Optional[VectorIndex]:
+    """
+    Load a persisted index if it was built over the given embeddings
+
+    Args:
+        path: .npz file written by save_index
+        embeddings: Current embedding matrix
+        fingerprint: Fingerprint of the current embeddings
+        **params: Query-time parameters such as nprobe
+
+    Returns:
+        The index, or None if it is missing or stale
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    try:
+        with np.load(path) as data:
+            metadata = json.loads(str(data['metadata']))
+            arrays: Dict[str, Any] = {k: data[k] for k in data.files if k != 'metadata'}
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not read vector index {path}: {str(e)}")
+        return None
+
+    if metadata.get('fingerprint') != fingerprint or metadata.get('rows') != len(embeddings):
+        logger.info(f"Vector index {path} is stale, ignoring it")
+        return None
+
+    kind = metadata.get('kind')
+    if kind == FlatIndex.kind:
+        return FlatIndex(embeddings)
+    if kind == IVFIndex.kind:
+        return IVFIndex(embeddings, **arrays, nprobe=params.get('nprobe', 8))
+    logger.warning(f"Unknown vector index type '{kind}' in {path}")
+    return None
+
+
+def update_index(
+    path: Union[str, Path],
+    embeddings: np.ndarray,
+    fingerprint: str,
+    previous_embeddings: np.ndarray,
+    previous_fingerprint: str,
+    previous_rows: np.ndarray,
+    **params
+) -> Optional[VectorIndex]:
+    """
+    Patch a persisted index for an incremental embedding update and save it
+
+    Args:
+        path: .npz file written by save_index
+        embeddings: New embedding matrix
+        fingerprint: Fingerprint of the new embeddings
+        previous_embeddings: Embedding matrix the persisted index was built over
+        previous_fingerprint: Fingerprint of the previous embeddings
+        previous_rows: For each new row, its previous row if unchanged, else -1
+        **params: Query-time parameters such as nprobe
+
+    Returns:
+        The updated index, or None if there is no usable index to patch
+    """
+    index = load_index(path, previous_embeddings, previous_fingerprint, **params)
+    if index is None:
+        return None
+    index = index.updated(embeddings, previous_rows)
+    save_index(index, path, fingerprint)
+    return index
@@ -0,0 +1,278 @@
+import importlib.util
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Parquet support is optional; without pyarrow only CSV is read and written
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+COLUMNAR_SUFFIX = ".parquet"
+
+# Explicit column types for processed data. Prices, ratings and amounts stay
+# float64 because they are returned verbatim in API responses.
+PRODUCT_DTYPES: Dict[str, str] = {
+    'Category': 'category',
+    'Store': 'category',
+    'Price': 'float64',
+    'Rating': 'float64',
+    'Rating_Count': 'int32',
+}
+
+ORDER_DTYPES: Dict[str, str] = {
+    'Order_ID': 'int64',
+    'Order_DateTime': 'datetime64[ns]',
+    'Customer_Id': 'int64',
+    'Gender': 'category',
+    'Device_Type': 'category',
+    'Customer_Login_type': 'category',
+    'Product_Category': 'category',
+    'Order_Priority': 'category',
+    'Payment_method': 'category',
+    'Quantity': 'float64',
+    'Sales': 'float64',
+    'Total_Amount': 'float64',
+    'Discount': 'float64',
+    'Profit': 'float64',
+    'Net_Profit': 'float64',
+    'Shipping_Cost': 'float64',
+}
+
+
+def is_columnar(path: Union[str, Path]) -> bool:
+    """Whether path is a columnar (Parquet) data file"""
+    return Path(path).suffix == COLUMNAR_SUFFIX
+
+
+def columnar_path(path: Union[str, Path]) -> Path:
+    """The Parquet file stored alongside a CSV data file"""
+    return Path(path).with_suffix(COLUMNAR_SUFFIX)
+
+
+def _unique_columns(columns: Sequence) -> list:
+    """Rename repeated column names the way read_csv does (X, X.1, X.2, ...), as Parquet requires"""
+    seen: Dict[str, int] = {}
+    names = []
+    for col in map(str, columns):
+        name = col
+        while name in seen:
+            seen[col] += 1
+            name = f"{col}.{seen[col]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _csv_header(columns: Sequence) -> list:
+    """Undo _unique_columns, so a CSV header repeats names the way the source file did"""
+    seen: Dict[str, int] = {}
+    names = []
+    for col in map(str, columns):
+        base, _, suffix = col.rpartition('.')
+        if base in seen and suffix == str(seen[base] + 1):
+            seen[base] += 1
+            col = base
+        else:
+            seen.setdefault(col, 0)
+        names.append(col)
+    return names
+
+
+def _lists_as_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace list cells with the text a CSV file holds for them ("['a', 'b']") in place
+
+    Parquet would store them as list columns, which read back as numpy
+    arrays that neither the API nor CSV output can serialize.
+
+    Args:
+        df: DataFrame to update
+
+    Returns:
+        The same DataFrame
+    """
+    for col in df.columns:
+        values = df[col]
+        if values.dtype != object:
+            continue
+        is_list = values.map(lambda value: isinstance(value, (list, tuple, np.ndarray)))
+        if is_list.any():
+            df[col] = values.where(~is_list, values[is_list].map(lambda value: str(list(value))))
+    return df
+
+
+def apply_dtypes(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """
+    Cast columns to their declared types in place
+
+    Columns that are absent, or whose values do not fit the declared
+    type, are left unchanged.
+
+    Args:
+        df: DataFrame to convert
+        dtypes: Column name to dtype
+
+    Returns:
+        The same DataFrame
+    """
+    for col, dtype in dtypes.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype.startswith('datetime64') and pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+        try:
+            if dtype.startswith('datetime64'):
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+            elif dtype.startswith(('int', 'float')):
+                df[col] = pd.to_numeric(df[col], errors='raise').astype(dtype)
+            else:
+                df[col] = df[col].astype(dtype)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Keeping column {col} as {df[col].dtype}: {str(e)}")
+    return df
+
+
+def read_table(path: Union[str, Path], columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Read a data file, projecting to the given columns when it is columnar
+
+    Args:
+        path: Parquet or CSV file
+        columns: Columns to read (those missing from the file are skipped),
+            None for all. CSV files are always read whole.
+
+    Returns:
+        The DataFrame
+    """
+    path = Path(path)
+    if not is_columnar(path):
+        # Exact float parsing, so rewriting the file does not change values
+        return pd.read_csv(path, float_precision='round_trip')
+
+    if columns is not None:
+        import pyarrow.parquet as pq
+        available = set(pq.read_schema(path).names)
+        columns = [col for col in columns if col in available]
+    # Files written before list cells were stored as text hold list columns
+    return _lists_as_text(pd.read_parquet(path, columns=columns))
+
+
+def write_table(df: pd.DataFrame, path: Union[str, Path], dtypes: Optional[Dict[str, str]] = None) -> Path:
+    """
+    Write a data file with explicit column types
+
+    The format follows the suffix: Parquet for .parquet, CSV otherwise.
+    List cells are stored as the text CSV holds for them. The file is
+    written to a temporary name and renamed into place.
+
+    Args:
+        df: DataFrame to write
+        path: Destination file
+        dtypes: Column types applied before writing (Parquet only)
+
+    Returns:
+        The written path
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    if is_columnar(path):
+        if not HAS_PYARROW:
+            raise RuntimeError("Writing Parquet files requires pyarrow (pip install pyarrow)")
+        df = df.copy()
+        df.columns = _unique_columns(df.columns)
+        _lists_as_text(df)
+        apply_dtypes(df, dtypes or {})
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False, header=_csv_header(df.columns))
+    os.replace(tmp_path, path)
+    return path
+
+
+class TableAppender:
+    """
+    Write a data file one DataFrame chunk at a time
+
+    Parquet chunks become row groups with the schema of the first chunk,
+    CSV chunks are appended below one header. List cells are stored as
+    the text CSV holds for them. Integer columns are cast to
+    nullable integers, so a chunk with missing values keeps the declared
+    type. Categorical columns are stored as plain strings; apply_dtypes
+    restores them on load. Every later chunk is cast to the first chunk's
+    schema. The file is renamed into place on close.
+    """
+
+    def __init__(self, path: Union[str, Path], dtypes: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            path: Destination file, Parquet for .parquet, CSV otherwise
+            dtypes: Column types applied to each chunk before writing
+        """
+        self.path = Path(path)
+        self.dtypes = {
+            col: dtype.capitalize() if dtype.startswith('int') else dtype
+            for col, dtype in (dtypes or {}).items()
+        }
+        self.rows = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self._writer = None
+        if is_columnar(self.path) and not HAS_PYARROW:
+            raise RuntimeError("Writing Parquet files requires pyarrow (pip install pyarrow)")
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Write the next chunk; empty chunks are skipped"""
+        if df.empty:
+            return
+        if is_columnar(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            df = df.copy()
+            df.columns = _unique_columns(df.columns)
+            _lists_as_text(df)
+            apply_dtypes(df, self.dtypes)
+            for col in df.columns:
+                if isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].astype(str)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._tmp_path, table.schema)
+            else:
+                # A column may be inferred differently in this chunk, e.g. all missing
+                table = table.select(self._writer.schema.names).cast(self._writer.schema)
+            self._writer.write_table(table)
+        else:
+            header = _csv_header(df.columns) if not self.rows else False
+            df.to_csv(self._tmp_path, mode='a' if self.rows else 'w', header=header, index=False)
+        self.rows += len(df)
+
+    def close(self) -> Path:
+        """Finish the file and move it into place"""
+        if self.rows == 0:
+            raise ValueError(f"No rows were written to {self.path}")
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        """Discard the partially written file"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._tmp_path.unlink(missing_ok=True)
+
+
+def preferred_path(csv_path: Union[str, Path]) -> Path:
+    """The Parquet copy of a CSV data file if it exists and can be read, else the CSV"""
+    parquet_path = columnar_path(csv_path)
+    if HAS_PYARROW and parquet_path.exists():
+        return parquet_path
+    return Path(csv_path)